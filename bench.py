@@ -0,0 +1,202 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: bench.py
+
+Benchmark suite for generation throughput and memory. Times one generation of every scenario on
+every engine over a ladder of population sizes and predator/reproduction rates, and writes one JSON
+line per case (generations/sec, individuals/sec, peak memory) so runs can be compared between revisions.
+
+e.g. python bench.py --engines object counts --sizes 100 10000 --out bench.jsonl
+     python bench.py --compare old.jsonl new.jsonl
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+import counts
+import main
+import vectorized
+from interactions import BEHAVIOR_IDS
+from seeding import as_random
+
+
+SIZES = [10**2, 10**3, 10**4, 10**5, 10**6, 10**7]
+RATES = [(0.3, 0.7), (0.7, 0.7)]
+
+# Largest population each engine is run at, so the ladder finishes in reasonable time.
+MAX_SIZE = {'object': 10**6, 'vectorized': 10**7, 'counts': None}
+
+
+# ENGINE SETUP
+# Each returns (setup, step): setup() builds a fresh starting population outside the timed
+# region, step(population) runs one generation of it.
+def _object_engine(scenario, predator_rate, reprod_rate, size, seed):
+    rng = as_random(seed)
+
+    def setup():
+        return main.initial_population(size, scenario.behaviors)
+
+    def step(population):
+        main.do_generation(population, predator_rate, reprod_rate, scenario.tracked, rng=rng)
+
+    return setup, step
+
+
+def _vectorized_engine(scenario, predator_rate, reprod_rate, size, seed):
+    rng = np.random.default_rng(seed)
+    codes = np.array([BEHAVIOR_IDS[b] for b in scenario.behaviors], dtype=np.int8)
+
+    def setup():
+        return codes[np.arange(size) % len(codes)]
+
+    def step(population):
+        vectorized.do_generation_full_vectorized(population, predator_rate, reprod_rate, rng)
+
+    return setup, step
+
+
+def _counts_engine(scenario, predator_rate, reprod_rate, size, seed):
+    rng = np.random.default_rng(seed)
+
+    def setup():
+        return counts.initial_counts(size, scenario.behaviors)
+
+    def step(population):
+        counts.do_generation_counts(population, predator_rate, reprod_rate, rng)
+
+    return setup, step
+
+
+ENGINES = {
+    'object': _object_engine,
+    'vectorized': _vectorized_engine,
+    'counts': _counts_engine,
+}
+
+
+# MEASUREMENT
+def bench_case(engine: str, scenario: str, size: int, predator_rate: float, reprod_rate: float,
+               repeats: int = 3, seed: int = 0) -> dict:
+    """
+    Times one generation from a fresh population of the given size, best of repeats,
+    then measures its peak traced memory in a separate (untimed) run.
+    """
+    setup, step = ENGINES[engine](main.SCENARIOS[scenario], predator_rate, reprod_rate, size, seed)
+
+    best = float('inf')
+    for _ in range(repeats):
+        population = setup()
+        start = time.perf_counter()
+        step(population)
+        best = min(best, time.perf_counter() - start)
+
+    # tracemalloc slows things down, so memory is measured on its own run
+    population = setup()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    step(population)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'engine': engine,
+        'scenario': scenario,
+        'size': size,
+        'predator_rate': predator_rate,
+        'reprod_rate': reprod_rate,
+        'seconds_per_gen': best,
+        'gens_per_sec': 1 / best,
+        'individuals_per_sec': size / best,
+        'peak_bytes': peak,
+    }
+
+
+def environment() -> dict:
+    # Revision and versions, stored with every run so results can be matched up later
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {'revision': revision, 'python': platform.python_version(), 'numpy': np.__version__}
+
+
+def run_benchmarks(engines: list[str], scenarios: list[str], sizes: list[int], rates: list[tuple[float, float]],
+                   out: str, repeats: int = 3):
+    """
+    Runs every (engine, scenario, size, rates) case and appends one JSON line per case to out.
+    Sizes over an engine's MAX_SIZE are skipped.
+    """
+    env = environment()
+    with open(out, 'a') as f:
+        for engine in engines:
+            for scenario in scenarios:
+                for size in sizes:
+                    if MAX_SIZE[engine] is not None and size > MAX_SIZE[engine]:
+                        continue
+                    for predator_rate, reprod_rate in rates:
+                        result = bench_case(engine, scenario, size, predator_rate, reprod_rate, repeats)
+                        f.write(json.dumps({**env, **result}) + '\n')
+                        f.flush()
+                        print(
+                            f"{engine:>10} {scenario:>24} n={size:<9} pred={predator_rate} reprod={reprod_rate} "
+                            f"{result['gens_per_sec']:10.2f} gen/s {result['individuals_per_sec']:14.0f} ind/s "
+                            f"{result['peak_bytes'] / 2**20:9.1f} MiB"
+                        )
+
+
+def load_results(path: str) -> dict:
+    # Latest result of each case in a results file
+    results = {}
+    with open(path) as f:
+        for line in f:
+            r = json.loads(line)
+            key = (r['engine'], r['scenario'], r['size'], r['predator_rate'], r['reprod_rate'])
+            results[key] = r
+    return results
+
+
+def compare(old_path: str, new_path: str, threshold: float = 0.1) -> list[tuple]:
+    """
+    Cases in both files whose throughput dropped by more than threshold (a fraction).
+    Returns (case, old gens/sec, new gens/sec) for each regression.
+    """
+    old, new = load_results(old_path), load_results(new_path)
+    regressions = []
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key]['gens_per_sec'], new[key]['gens_per_sec']
+        if after < before * (1 - threshold):
+            regressions.append((key, before, after))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark generation throughput and memory.")
+    parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument('--scenarios', nargs='+', default=list(main.SCENARIOS), choices=list(main.SCENARIOS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES)
+    parser.add_argument('--rates', nargs='+', default=[f'{p}:{r}' for p, r in RATES],
+                        help="predator_rate:reprod_rate pairs")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--out', default='bench.jsonl')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="report regressions between two result files")
+    parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        for key, before, after in regressions:
+            print(f"REGRESSION {key}: {before:.2f} -> {after:.2f} gen/s")
+        raise SystemExit(1 if regressions else 0)
+
+    rates = [tuple(float(x) for x in pair.split(':')) for pair in args.rates]
+    run_benchmarks(args.engines, args.scenarios, args.sizes, rates, args.out, args.repeats)
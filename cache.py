@@ -0,0 +1,160 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: cache.py
+
+Content addressed disk cache for simulation results. A run is keyed by a hash of the simulation
+function, its scenario definition, the interaction table, its parameters, its seed and
+main.ENGINE_VERSION, so the same seeded run is only ever computed once. The cache keeps to a size
+limit by evicting the least recently used results, and any number of processes can share it:
+results are written atomically and a result removed by another process (or left unreadable)
+simply counts as a miss.
+
+    cache = ResultCache('.simcache')
+    metrics = cache.call(main.do_simulation_full, 50, 500, 0.7, 0.7, rng=1)
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+
+import main
+from interactions import EXCLUSIVE, SURVIVAL
+
+
+class ResultCache:
+    '''
+    Simulation results stored as one pickle file per run under directory, at most max_bytes in total.
+    Only runs with an integer seed are cached; without one a run isn't reproducible, so it is just run.
+    size is a running estimate of the cache's total size: measured by the last eviction scan, plus
+    whatever this process has stored since (not what other processes have).
+    '''
+    def __init__(self, directory: str = '.simcache', max_bytes: int = 2**30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = None
+
+
+    def __repr__(self):
+        return f'ResultCache in {self.directory}, up to {self.max_bytes} bytes'
+
+
+    def key(self, simulation, params: dict) -> str:
+        """
+        Hash of everything that determines a run's result: which simulation it is (and its
+        scenario, for the main.do_simulation_* functions), the interaction table, the parameters
+        (seed included) and the engine version.
+        """
+        name = simulation.__name__.removeprefix('do_simulation_')
+        scenario = main.SCENARIOS.get(name) if simulation.__module__ == 'main' else None
+        content = {
+            'simulation': f'{simulation.__module__}.{simulation.__qualname__}',
+            'scenario': None if scenario is None else [scenario.behaviors, scenario.tracked],
+            'interactions': [SURVIVAL, EXCLUSIVE],
+            'params': params,
+            'engine': main.ENGINE_VERSION,
+        }
+        encoded = json.dumps(content, sort_keys=True, default=repr).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+
+    def path(self, key: str) -> str:
+        # Results are spread over 256 subdirectories by the first byte of the key
+        return os.path.join(self.directory, key[:2], f'{key}.pkl')
+
+
+    def get(self, key: str):
+        """
+        Stored result for key, or None on a miss. A hit marks the result as recently used.
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+            os.utime(path)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        return result
+
+
+    def put(self, key: str, result):
+        """
+        Stores result under key, written to a temporary file and renamed into place so other
+        processes never see a partial result, then evicts old results if the size estimate is
+        over the limit (only the first put of a process scans the cache regardless).
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            written = f.tell()
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp, path)
+
+        if self.size is not None:
+            self.size += written - replaced
+        if self.size is None or self.size > self.max_bytes:
+            self.evict()
+
+
+    def evict(self, fill: float = 0.9):
+        """
+        Removes least recently used results until the cache fits in fill * max_bytes, leaving
+        room so the puts right after don't each scan the cache again. Resets the size estimate.
+        """
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.pkl'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= fill * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.size = total
+
+
+    def call(self, simulation, *args, **kwargs):
+        """
+        simulation(*args, **kwargs), from the cache if this exact run was done before.
+        """
+        bound = inspect.signature(simulation).bind(*args, **kwargs)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        if not isinstance(params.get('rng'), int):
+            return simulation(*args, **kwargs)
+
+        key = self.key(simulation, params)
+        result = self.get(key)
+        if result is None:
+            result = simulation(*args, **kwargs)
+            self.put(key, result)
+        return result
+
+
+    def wrap(self, simulation):
+        """
+        Cached version of a simulation function, e.g. full = cache.wrap(main.do_simulation_full).
+        """
+        @functools.wraps(simulation)
+        def cached(*args, **kwargs):
+            return self.call(simulation, *args, **kwargs)
+        return cached
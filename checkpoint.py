@@ -0,0 +1,125 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: checkpoint.py
+
+Checkpoint and resume for long simulation runs. The run's records stream to a CSV file, and every
+k generations or T seconds it saves its population (packed as one byte per individual), random
+generator state, how much of the CSV is written and whether it got absorbed yet, so a checkpoint
+stays the same size however long the run is. Starting the same run again picks up from the latest checkpoint, drops any records
+written after it, and produces exactly the trajectory an uninterrupted run would have.
+"""
+
+import os
+import pickle
+import time
+from collections import Counter
+
+from interactions import BEHAVIORS, BEHAVIOR_IDS
+from main import Individual, iter_simulation
+from seeding import as_random
+from stream import CSVSink
+
+
+def pack(population: list[Individual]) -> bytes:
+    """
+    One byte behavior ID per individual, in population order (order matters for the next shuffle).
+    """
+    return bytes(BEHAVIOR_IDS[i.behavior] for i in population)
+
+
+def unpack(packed: bytes) -> list[Individual]:
+    return [Individual(BEHAVIORS[b]) for b in packed]
+
+
+def save_checkpoint(path: str, state: dict):
+    """
+    Writes state to path atomically, so a crash mid-write never leaves a broken checkpoint.
+    """
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str) -> dict | None:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def run_checkpointed(scenario: str, gens: int, size: int, predator_rate: float, reprod_rate: float, path: str,
+                     out: str, trees: int | None = None, rng=None, every: int | None = 100,
+                     interval: float | None = None, chunk_size: int = 100):
+    """
+    Same run as main.iter_simulation, with its records streamed to the CSV file out and the run
+    checkpointed to path. If path already holds a checkpoint of this run, it resumes from there
+    instead of starting over, otherwise any old out is replaced. Raises ValueError if path holds
+    a checkpoint of a different run (other parameters or seed).
+
+    Returns when the run got absorbed, (generation, outcome) as main.absorption, None if it didn't.
+
+    @path: checkpoint file
+    @out: CSV file for the records
+    @rng: seed or random.Random; use a seed (not the global random module) so the run can be resumed
+    @every: checkpoint every this many generations (None to turn off)
+    @interval: also checkpoint once this many seconds have passed since the last one (None to turn off)
+    @chunk_size: records held in memory between writes to out
+    """
+    # The seed is part of the run, a checkpoint from another seed would continue the wrong trajectory
+    params = {
+        'scenario': scenario, 'gens': gens, 'size': size, 'predator_rate': predator_rate,
+        'reprod_rate': reprod_rate, 'trees': trees, 'seed': rng if isinstance(rng, int) else None,
+    }
+    rng = as_random(rng)
+
+    state = {}
+    checkpoint = load_checkpoint(path)
+    if checkpoint is not None:
+        # Resume where the last checkpoint left off
+        if checkpoint['params'] != params:
+            raise ValueError(f"Checkpoint {path} is for a different run: {checkpoint['params']}")
+        population = unpack(checkpoint['population'])
+        rng.setstate(checkpoint['rng'])
+        state = {
+            'population': population,
+            'counts': Counter(i.behavior for i in population),
+            'generation': checkpoint['generation'],
+            'absorption': checkpoint['absorption'],
+        }
+        # Records written after the checkpoint are about to be redone
+        with open(out, 'r+b') as f:
+            f.truncate(checkpoint['written'])
+    elif os.path.exists(out):
+        os.remove(out)
+
+    last_save = time.monotonic()
+    with CSVSink(out, chunk_size) as sink:
+        for record in iter_simulation(scenario, gens, size, predator_rate, reprod_rate, trees, rng, state=state):
+            sink.write(record)
+            # Only between simulated generations, not in the analytic tail of an absorbed run
+            if state['generation'] != record['generation'] + 1:
+                continue
+            due = every is not None and state['generation'] % every == 0
+            due = due or (interval is not None and time.monotonic() - last_save >= interval)
+            if due:
+                sink.flush()
+                _save(path, params, state, rng, out)
+                last_save = time.monotonic()
+
+    _save(path, params, state, rng, out)
+    return state['absorption']
+
+
+def _save(path: str, params: dict, state: dict, rng, out: str):
+    # Checkpoint of the run as it is now, with out already flushed up to the same generation
+    save_checkpoint(path, {
+        'params': params,
+        'generation': state['generation'],
+        'absorption': state['absorption'],
+        'population': pack(state['population']),
+        'rng': rng.getstate(),
+        'written': os.path.getsize(out) if os.path.exists(out) else 0,
+    })
@@ -0,0 +1,226 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: counts.py
+
+Count based (aggregate) generation engine. Individuals of the same behavior are interchangeable,
+so the population is just a vector of per-behavior counts. Pairing, predator encounters, survival
+and reproduction are sampled with hypergeometric and binomial draws, so the cost of a generation
+depends on the number of behaviors, not on the number of individuals.
+
+Counts may carry leading axes (e.g. one row per replicate); every draw broadcasts over them.
+"""
+
+import numpy as np
+
+from interactions import BEHAVIORS, BEHAVIOR_IDS, FULL_BEHAVIORS
+from seeding import as_generator
+from tables import EXCLUSIVE, SURVIVE, UNDEFINED
+
+# numpy's exact hypergeometric sampler only takes counts below this.
+HYPERGEOMETRIC_LIMIT = 10**9
+
+# Largest population a generation can start from: its children (at most two per individual)
+# still fit in int64 counts.
+POPULATION_LIMIT = np.iinfo(np.int64).max // 2
+
+# Pairs that can never meet get zero survival chances, they are checked for separately.
+_SURVIVE = np.nan_to_num(SURVIVE)
+
+
+# SAMPLING HELPERS
+def _hypergeometric(rng, good, bad, nsample):
+    """
+    Number of good items when drawing nsample without replacement, broadcast over arrays.
+    Counts past numpy's exact sampler limit use a normal approximation with the
+    exact hypergeometric mean and variance.
+    """
+    good, bad, nsample = np.broadcast_arrays(
+        np.asarray(good, dtype=np.int64), np.asarray(bad, dtype=np.int64), np.asarray(nsample, dtype=np.int64)
+    )
+    big = (good >= HYPERGEOMETRIC_LIMIT) | (bad >= HYPERGEOMETRIC_LIMIT)
+    if not big.any():
+        return rng.hypergeometric(good, bad, nsample)
+
+    # Exact draws where possible, dummy arguments in the big cells
+    out = rng.hypergeometric(np.where(big, 0, good), np.where(big, 0, bad), np.where(big, 0, nsample))
+
+    total = (good + bad).astype(float)
+    frac = np.divide(good, total, out=np.zeros_like(total), where=total > 0)
+    mean = nsample * frac
+    var = mean * (1 - frac) * np.divide(total - nsample, total - 1, out=np.zeros_like(total), where=total > 1)
+    approx = np.rint(mean + np.sqrt(np.maximum(var, 0)) * rng.standard_normal(mean.shape)).astype(np.int64)
+    approx = np.clip(approx, np.maximum(0, nsample - bad), np.minimum(nsample, good))
+
+    return np.where(big, approx, out)
+
+
+def _multivariate_hypergeometric(rng, colors, nsample):
+    """
+    Per-behavior counts when drawing nsample individuals without replacement from colors.
+    Drawn one behavior at a time as conditional univariate draws so it broadcasts over
+    leading axes.
+
+    @colors: counts per behavior, shape (..., behaviors)
+    @nsample: number to draw, shape (...)
+    """
+    # A single count vector below the exact limit takes the same draws one scalar at a time,
+    # which skips the array overhead that dominates for small populations
+    if colors.ndim == 1 and colors.sum() < HYPERGEOMETRIC_LIMIT:
+        out = [0] * len(colors)
+        left, rest = int(nsample), int(colors.sum())
+        for b, good in enumerate(colors[:-1].tolist()):
+            rest -= good
+            # Nothing left to draw, numpy takes no random numbers for these
+            if not left:
+                break
+            out[b] = int(rng.hypergeometric(good, rest, left))
+            left -= out[b]
+        out[-1] = left
+        return np.array(out, dtype=colors.dtype)
+
+    out = np.zeros_like(colors)
+    left = np.array(nsample, dtype=np.int64)
+    rest = colors.sum(axis=-1)
+
+    for b in range(colors.shape[-1] - 1):
+        good = colors[..., b]
+        rest = rest - good
+        out[..., b] = _hypergeometric(rng, good, rest, left)
+        left = left - out[..., b]
+    out[..., -1] = left
+
+    return out
+
+
+# CONVERSION
+def initial_counts(size: int, behaviors: list[str]) -> np.ndarray:
+    """
+    Count vector for an even split of behaviors, matching the i % len(behaviors)
+    initialisation of the do_simulation_* functions.
+    """
+    counts = np.zeros(len(BEHAVIORS), dtype=np.int64)
+    for k, b in enumerate(behaviors):
+        counts[BEHAVIOR_IDS[b]] = len(range(k, size, len(behaviors)))
+    return counts
+
+
+def proportions(counts: np.ndarray) -> np.ndarray:
+    """
+    Share of each behavior in a count vector (or array of them). Extinct populations give 0.
+    """
+    counts = np.asarray(counts)
+    size = counts.sum(axis=-1, keepdims=True)
+    return np.divide(counts, size, out=np.zeros(counts.shape), where=size > 0)
+
+
+# GENERATION FUNCTIONS
+def pair_counts(counts: np.ndarray, rng, trees: int | None = None) -> np.ndarray:
+    """
+    Random pairing at trees in count form. Returns pairs[..., b1, b2], the number of trees with
+    behavior b1 in the first slot and b2 in the second: the same makeup a shuffle of individuals
+    paired two by two gives, drawn without touching individuals. An odd one out goes without food.
+
+    @counts: int counts per behavior ID, shape (..., behaviors)
+    @rng: numpy Generator
+    @trees: number of trees, only 2 * trees random individuals forage. Unlimited if None
+    """
+    # With a limited number of trees only 2 per tree forage, the rest go without food
+    if trees is not None:
+        counts = _multivariate_hypergeometric(rng, counts, np.minimum(counts.sum(axis=-1), 2 * trees))
+    n_pairs = counts.sum(axis=-1) // 2
+
+    # Behaviors in the first and second slot of every tree
+    first = _multivariate_hypergeometric(rng, counts, n_pairs)
+    second = _multivariate_hypergeometric(rng, counts - first, n_pairs)
+
+    # Random matching of first slots to second slots gives pairs[..., b1, b2]
+    pairs = np.zeros(counts.shape + counts.shape[-1:], dtype=np.int64)
+    pool = second
+    for b in range(counts.shape[-1]):
+        pairs[..., b, :] = _multivariate_hypergeometric(rng, pool, first[..., b])
+        pool = pool - pairs[..., b, :]
+    return pairs
+
+
+def do_generation_counts(counts: np.ndarray, predator_rate: float, reprod_rate: float, rng=None,
+                         trees: int | None = None):
+    """
+    Count version of a generation. Same rules as do_generation_full: individuals are paired
+    at random at trees, an odd one out goes without food, predators show up with
+    predator_rate, and every fed individual has two children with reprod_rate.
+
+    @counts: int counts per behavior ID, shape (..., behaviors)
+    @predator_rate: chance a predator is present at a tree
+    @reprod_rate: chance a fed individual reproduces
+    @rng: seed or numpy Generator, a fresh one is made if not given
+    @trees: number of trees, only two individuals per tree forage. Unlimited if None
+
+    Raises OverflowError if the population is too large for the next generation to fit in int64
+    counts, which an unlimited population (trees=None) that keeps growing gets to eventually.
+    """
+    rng = as_generator(rng)
+    counts = np.asarray(counts, dtype=np.int64)
+    if (counts.sum(axis=-1) > POPULATION_LIMIT).any():
+        raise OverflowError(
+            f"Population is over {POPULATION_LIMIT}, its children would overflow int64 counts; limit it with trees"
+        )
+    pairs = pair_counts(counts, rng, trees)
+
+    # Determine how many trees of each pair have a predator
+    attacked = rng.binomial(pairs, predator_rate)
+    undefined = (attacked > 0) & UNDEFINED
+    if undefined.any():
+        b1, b2 = np.argwhere(undefined.reshape(-1, *UNDEFINED.shape).any(axis=0))[0]
+        raise ValueError(f"No predator interaction defined for 1: {BEHAVIORS[b1]}, 2: {BEHAVIORS[b2]}")
+
+    # Survivors of predator trees, exclusive pairs have exactly one survivor
+    survived1 = rng.binomial(attacked, _SURVIVE[..., 0])
+    survived2 = np.where(EXCLUSIVE, attacked - survived1, rng.binomial(attacked, _SURVIVE[..., 1]))
+
+    # No predator, both get food and live
+    safe = pairs - attacked
+    fed = (safe + survived1).sum(axis=-1) + (safe + survived2).sum(axis=-2)
+
+    # Reproduction, osmosis style. Only if food was grabbed
+    return 2 * rng.binomial(fed, reprod_rate)
+
+
+# SIMULATION FUNCTIONS
+def do_simulation_counts(gens: int, counts: np.ndarray, predator_rate: float, reprod_rate: float, rng=None,
+                         trees: int | None = None):
+    """
+    Runs gens generations of the count engine.
+    Returns counts per generation, shape (..., gens + 1, behaviors); index 0 is the initial population.
+    Raises OverflowError, naming the generation, once an unlimited population outgrows int64 counts.
+    """
+    rng = as_generator(rng)
+    counts = np.asarray(counts, dtype=np.int64)
+
+    history = [counts]
+    for generation in range(gens):
+        try:
+            counts = do_generation_counts(counts, predator_rate, reprod_rate, rng, trees)
+        except OverflowError as e:
+            raise OverflowError(f"Generation {generation}: {e}") from None
+        history.append(counts)
+
+    return np.stack(history, axis=-2)
+
+
+def do_simulation_baseline_counts(gens: int, size: int, predator_rate: float, reprod_rate: float, rng=None,
+                                  trees: int | None = None):
+    """
+    Count version of do_simulation_baseline, returns population size after each generation.
+    """
+    history = do_simulation_counts(gens, initial_counts(size, ['base']), predator_rate, reprod_rate, rng, trees)
+    return history[1:].sum(axis=-1).tolist()
+
+
+def do_simulation_full_counts(gens: int, size: int, predator_rate: float, reprod_rate: float, rng=None,
+                              trees: int | None = None):
+    """
+    Count version of do_simulation_full, returns the same metrics dict of lists.
+    """
+    history = do_simulation_counts(gens, initial_counts(size, FULL_BEHAVIORS), predator_rate, reprod_rate, rng, trees)
+    props = proportions(history[:-1])
+    return {b: props[:, BEHAVIOR_IDS[b]].tolist() for b in FULL_BEHAVIORS}
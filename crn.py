@@ -0,0 +1,162 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: crn.py
+
+Paired scenario comparisons with common random numbers. Every individual gets its own uniforms
+(shuffle key, predator, survival, reproduction) from streams seeded by the replicate, generation and
+its behavior, so two runs that share a seed use the same draws for matching individuals. The
+coupling is weak, though: tree partners are neighbours in shuffle key order, so one individual more
+or less shifts the partner of everyone after it, and the runs decorrelate once their counts differ.
+On full at predator rate 0.6 vs 0.7 (40 replicates) the median efficiency is about 1.3, i.e. the
+pairing saves roughly a quarter of the replicates. Antithetic mode adds a mirrored twin of every
+replicate that uses 1 - u for every uniform u; there it cut the stderr to about 0.73x, for twice
+the runs, so it costs more than it saves.
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+
+from main import SCENARIOS
+from seeding import derive_seed, root_seed
+from tables import EXCLUSIVE, SURVIVE
+from vectorized import CODES
+
+
+STREAMS = ['shuffle', 'predator', 'survival', 'reproduction']
+
+
+def _uniforms(codes: np.ndarray, seed: int, generation: int, antithetic: bool, lanes: dict) -> dict:
+    """
+    One uniform per individual for every stream, for a population sorted by behavior code.
+    The k-th individual of a behavior always gets the k-th draw of that behavior's lane,
+    so two populations with similar counts share most of their draws (though not their pairings).
+
+    @lanes: lane number of each behavior code. Behaviors in the same lane of two scenarios
+            (e.g. the second behavior of spite_cowardice and of selectivespite_cowardice) share draws
+    """
+    behaviors, sizes = np.unique(codes, return_counts=True)
+    draws = {}
+    for stream in STREAMS:
+        u = np.concatenate([
+            np.random.default_rng(derive_seed(seed, generation, stream, lanes[b])).random(n)
+            for b, n in zip(behaviors, sizes)
+        ]) if len(codes) else np.zeros(0)
+        draws[stream] = 1 - u if antithetic else u
+    return draws
+
+
+def do_generation_common(codes: np.ndarray, predator_rate: float, reprod_rate: float, seed: int, generation: int,
+                         lanes: dict, trees: int | None = None, antithetic: bool = False) -> np.ndarray:
+    """
+    One generation on the array engine's rules, with every random outcome tied to an individual's
+    own uniforms (see _uniforms) rather than to a position in the shuffle. Individuals are shuffled
+    by their key, a tree's predator draw is its first individual's, and each individual's survival
+    and reproduction use its own draws. Returns the next generation's codes.
+    """
+    codes = np.sort(codes)
+    u = _uniforms(codes, seed, generation, antithetic, lanes)
+
+    # Shuffle by random key, only 2 per tree forage when trees are limited
+    order = np.argsort(u['shuffle'], kind='stable')
+    if trees is not None:
+        order = order[:2 * trees]
+    n_pairs = len(order) // 2
+    slots = order[:2 * n_pairs]
+    first, second = slots[0::2], slots[1::2]
+    ind1, ind2 = codes[first], codes[second]
+
+    predator = u['predator'][first] <= predator_rate
+
+    odds = SURVIVE[ind1, ind2]
+    fed1 = u['survival'][first] < odds[:, 0]
+    fed2 = np.where(EXCLUSIVE[ind1, ind2], ~fed1, u['survival'][second] < odds[:, 1])
+    fed1 |= ~predator
+    fed2 |= ~predator
+
+    fed = np.empty(2 * n_pairs, dtype=bool)
+    fed[0::2] = fed1
+    fed[1::2] = fed2
+    parents = codes[slots][fed & (u['reproduction'][slots] < reprod_rate)]
+    return np.repeat(parents, 2)
+
+
+def run_common(scenario: str, gens: int, size: int, predator_rate: float, reprod_rate: float,
+               trees: int | None = None, seed: int = 0, antithetic: bool = False) -> dict:
+    """
+    One run of a scenario on the common random number streams of seed.
+    Returns {metric: array over generations} for its tracked behaviors and population,
+    in the same form as main.iter_simulation's records.
+    """
+    scenario = SCENARIOS[scenario]
+    start = np.array([CODES[b] for b in scenario.behaviors], dtype=np.int8)
+    codes = start[np.arange(size) % len(start)]
+    # The scenario's k-th behavior draws from lane k
+    lanes = {CODES[b]: k for k, b in enumerate(scenario.behaviors)}
+
+    metrics = {m: np.zeros(gens) for m in [*scenario.tracked, 'population']}
+    for generation in range(gens):
+        if len(codes):
+            counts = np.bincount(codes, minlength=len(SURVIVE))
+            for b in scenario.tracked:
+                metrics[b][generation] = counts[CODES[b]] / len(codes)
+            codes = do_generation_common(codes, predator_rate, reprod_rate, seed, generation, lanes, trees, antithetic)
+        metrics['population'][generation] = len(codes)
+
+    return metrics
+
+
+def compare(arm_a: dict, arm_b: dict, metric_a: str, metric_b: str | None = None, replicates: int = 20,
+            seed: int | None = None, antithetic: bool = False, common: bool = True,
+            confidence: float = 0.95) -> dict:
+    """
+    Paired comparison of two arms, e.g. spite vs selective spite, or one scenario at two predator rates:
+
+        compare({'scenario': 'spite_cowardice'}, {'scenario': 'selectivespite_cowardice'}, 'cowardice')
+        compare({'scenario': 'full', 'predator_rate': 0.6}, {'scenario': 'full', 'predator_rate': 0.7}, 'spite')
+
+    Replicate r of both arms runs on the same streams (derive_seed(seed, r)), and the per generation
+    difference metric_a - metric_b is averaged over replicates. With antithetic, replicates come in
+    mirrored pairs and each pair's mean difference counts as one observation.
+
+    Returns arrays over generations: 'mean' difference, its 'stderr', 'ci_lower'/'ci_upper', and
+    'efficiency', the variance two independent arms would have over the paired variance,
+    i.e. roughly how many times fewer replicates the pairing needs for the same confidence
+    (check it, it is often not much above 1, see the module docstring).
+
+    @arm_a, arm_b: 'scenario' plus any of gens, size, predator_rate, reprod_rate, trees,
+                   missing ones from the scenario's defaults
+    @metric_b: metric of arm_b to compare against, metric_a if None
+    @replicates: number of replicates (of pairs, with antithetic)
+    @common: False runs arm_b on independent streams, for comparison
+    """
+    if seed is None:
+        seed = root_seed()
+    twins = [False, True] if antithetic else [False]
+
+    values = []
+    for k, (arm, metric) in enumerate([(arm_a, metric_a), (arm_b, metric_b or metric_a)]):
+        params = {**SCENARIOS[arm['scenario']].defaults, **arm}
+        runs = []
+        for r in range(replicates):
+            run_seed = derive_seed(seed, r) if common or k == 0 else derive_seed(seed, 'independent', r)
+            # An antithetic pair counts as one replicate, its mean is the observation
+            runs.append(np.mean([run_common(**params, seed=run_seed, antithetic=twin)[metric] for twin in twins], axis=0))
+        values.append(np.array(runs))
+
+    a, b = values
+    diff = a - b
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    mean = diff.mean(axis=0)
+    stderr = diff.std(axis=0, ddof=1) / np.sqrt(replicates)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        efficiency = (a.var(axis=0, ddof=1) + b.var(axis=0, ddof=1)) / diff.var(axis=0, ddof=1)
+
+    return {
+        'mean': mean,
+        'stderr': stderr,
+        'ci_lower': mean - z * stderr,
+        'ci_upper': mean + z * stderr,
+        'efficiency': efficiency,
+    }
@@ -0,0 +1,131 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: figures.py
+
+Redraws the scenario figures from saved runs (the CSVs written by `python main.py`) instead of
+rerunning the simulation. Every figure gets a <image>.sha256 file next to it holding a hash of its
+inputs: the run's data and parameters, the plotting function's code and the matplotlib version.
+A figure is only redrawn when that hash changes, so editing a title or colour just redraws the
+figures that changed, and nothing else is simulated or drawn again.
+
+e.g. python figures.py results --out .
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+
+import matplotlib
+
+import main
+import render
+from stream import read_records
+
+
+# Files each scenario's plotting function writes.
+OUTPUTS = {
+    'baseline': ['baseline.png'],
+    'cowardice_altruist': ['cowardice_altruist.png'],
+    'gb_cowardice': ['cowardice_gbaltruist.png'],
+    'spite_cowardice': ['spite_cowardice.png'],
+    'selectivespite_cowardice': ['selectivespite_cowardice.png'],
+    'full': ['full_simulation.png', 'fullsim.gif'],
+}
+
+
+def load_run(path: str, scenario: str) -> tuple[list[dict], dict]:
+    """
+    Records of a saved run and its parameters, from the .json file the batch runner writes
+    next to the CSV (the scenario's defaults if there isn't one).
+    """
+    meta_path = f'{os.path.splitext(path)[0]}.json'
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            params = json.load(f)['params']
+    else:
+        params = main.SCENARIOS[scenario].defaults
+    return read_records(path), params
+
+
+def as_result(scenario: str, records: list[dict]):
+    """
+    Records in the form the scenario's do_simulation_* function returns, which is what its
+    plotting function takes: a dict for full, a tuple of lists per tracked behavior,
+    or the list of population sizes for baseline.
+    """
+    tracked = main.SCENARIOS[scenario].tracked
+    if not tracked:
+        return [r['population'] for r in records]
+    metrics = {b: [r[b] for r in records] for b in tracked}
+    return metrics if scenario == 'full' else tuple(metrics.values())
+
+
+def input_hash(scenario: str, data: bytes, params: dict, every: int = 1) -> str:
+    """
+    Hash of everything a figure depends on: the run's data and parameters, the plotting
+    code (and the animation code for full) and the matplotlib version.
+    """
+    h = hashlib.sha256(data)
+    settings = {'params': params, 'every': every, 'matplotlib': matplotlib.__version__}
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    h.update(inspect.getsource(main.PLOTS[scenario]).encode())
+    if scenario == 'full':
+        h.update(inspect.getsource(render).encode())
+    return h.hexdigest()
+
+
+def regenerate(scenario: str, path: str, out: str = '.', every: int = 1, force: bool = False) -> bool:
+    """
+    Draws a scenario's figures from the saved run at path into out, unless they are already
+    there and their inputs haven't changed. Returns True if they were drawn.
+
+    @path: CSV of the run, e.g. results/full_r0.csv
+    @every: keep every n-th generation in animations
+    @force: draw even if nothing changed
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    records, params = load_run(path, scenario)
+    digest = input_hash(scenario, data, params, every)
+
+    images = [os.path.join(out, name) for name in OUTPUTS[scenario]]
+    if not force and all(_recorded_hash(image) == digest for image in images):
+        return False
+
+    os.makedirs(out, exist_ok=True)
+    # Only the full simulation has an animation to decimate
+    options = {'every': every} if scenario == 'full' else {}
+    main.PLOTS[scenario](as_result(scenario, records), params, out, **options)
+
+    for image in images:
+        with open(f'{image}.sha256', 'w') as f:
+            f.write(digest + '\n')
+    return True
+
+
+def _recorded_hash(image: str) -> str | None:
+    # Hash stored next to an image, None if the image or its hash is missing
+    if not os.path.exists(image) or not os.path.exists(f'{image}.sha256'):
+        return None
+    with open(f'{image}.sha256') as f:
+        return f.read().strip()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Redraw scenario figures from saved runs.")
+    parser.add_argument('results', nargs='?', default='results', help="directory of <scenario>_r<replicate>.csv runs")
+    parser.add_argument('--scenarios', nargs='+', default=list(OUTPUTS), choices=list(OUTPUTS))
+    parser.add_argument('--replicate', type=int, default=0, help="which replicate to draw")
+    parser.add_argument('--out', default='.', help="directory for the figures")
+    parser.add_argument('--animation-every', type=main.positive_int, default=1)
+    parser.add_argument('--force', action='store_true', help="redraw even if nothing changed")
+    args = parser.parse_args()
+
+    for scenario in args.scenarios:
+        path = os.path.join(args.results, f'{scenario}_r{args.replicate}.csv')
+        if not os.path.exists(path):
+            continue
+        drawn = regenerate(scenario, path, args.out, args.animation_every, args.force)
+        print(f"{scenario}: {'drawn' if drawn else 'unchanged'}")
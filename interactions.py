@@ -0,0 +1,131 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: interactions.py
+
+Predator interaction table. Every behavior pairing is stored as data: the chance each individual
+survives (gets food) when a predator shows up at their tree. The table is built and validated once
+at import, then handle_predator and the array engines look outcomes up by integer behavior ID.
+"""
+
+
+# Every behavior known to the simulation, in ID order.
+BEHAVIORS = ['base', 'cowardice', 'altruist', 'gb_altruist', 'spite', 'selective_spite']
+BEHAVIOR_IDS = {behavior: i for i, behavior in enumerate(BEHAVIORS)}
+
+# Behaviors that only ever share a population with their own kind.
+ISOLATED = ['base']
+
+# Behaviors of the full simulation, everything that can meet everything else.
+FULL_BEHAVIORS = ['cowardice', 'altruist', 'gb_altruist', 'spite', 'selective_spite']
+
+# (behavior 1, behavior 2, survival chance 1, survival chance 2, exclusive)
+# Only one ordering of each mixed pair is needed, the mirrored one is filled in automatically.
+# Exclusive pairs have exactly one survivor; individual 1 survives with survival chance 1.
+INTERACTIONS = [
+    # 50/50 chance for baseline.
+    ('base', 'base', 0.5, 0.5, True),
+
+    # Selfish/cowardice behaviors result in a 75% chance of running away unscathed.
+    ('cowardice', 'cowardice', 0.75, 0.75, False),
+
+    # One altruist individual will alert, the other gets away guarenteed.
+    # The one who alerts has a 50% chance of getting killed.
+    ('altruist', 'altruist', 0.5, 1.0, False),
+
+    # The altruist individual alerts letting the cowardice get away free,
+    # But altruist now has 50% chance of death.
+    ('cowardice', 'altruist', 1.0, 0.5, False),
+
+    # The green beard altruist individual alerts letting the other get away free,
+    # But individual who alerted now has 50% chance of death.
+    ('gb_altruist', 'gb_altruist', 0.5, 1.0, False),
+
+    # Since cowardice not same type as green beard altruist, no alert given;
+    # Both have 25% chance of death
+    ('gb_altruist', 'cowardice', 0.75, 0.75, False),
+
+    # Spite alerts predator of cowardice's presence, raises cowardice's chance of death to 0.5.
+    ('spite', 'cowardice', 0.75, 0.5, False),
+
+    # Since both here are spiteful, both of their chances of death go up.
+    ('spite', 'spite', 0.25, 0.25, False),
+
+    # Selective spite alerts predator of cowardice's presence, raises cowardice's chance of death to 0.5.
+    ('selective_spite', 'cowardice', 0.75, 0.5, False),
+
+    # Since selective spite only alerts predator of other species' presence, both just run away.
+    ('selective_spite', 'selective_spite', 0.75, 0.75, False),
+
+    # Altruist alerts selective spite to predator, and selective spite alerts predator of
+    # altruist's presence. 0.75 death rate for altruist, selective spite gets away free.
+    ('altruist', 'selective_spite', 0.25, 1.0, False),
+
+    # Altruist alerts spite to predator, and spite alerts predator of
+    # altruist's presence. 0.75 death rate for altruist, spite gets away free.
+    ('altruist', 'spite', 0.25, 1.0, False),
+
+    # No alert given by green beard, and selective spite alerts predator of green
+    # beard's presence. 0.5 death rate for green beard, selective spite 0.25.
+    ('selective_spite', 'gb_altruist', 0.75, 0.5, False),
+
+    # Spite exchanged both ways. Predator is notified of both, one dies one doesn't.
+    ('selective_spite', 'spite', 0.5, 0.5, True),
+
+    # No alert given by green beard, spite alerts predator of green beard's presence.
+    # 0.25 death rate for spite, 0.5 for green beard.
+    ('spite', 'gb_altruist', 0.75, 0.5, False),
+
+    # Altruist gives alert, green beard does not. 0.25 death rate for green beard, 0.5 death
+    # rate for altruist.
+    ('gb_altruist', 'altruist', 0.75, 0.5, False),
+]
+
+
+def build_table(behaviors: list[str], interactions: list[tuple], isolated: list[str]):
+    """
+    Builds the survival and exclusive lookup tables from interaction rows, and checks
+    that every pair of behaviors that can meet has a valid outcome.
+
+    SURVIVAL[id1][id2][k] is the chance individual k (0 or 1) of the pair gets food.
+    EXCLUSIVE[id1][id2] is True when exactly one of the pair survives.
+    Pairs that can never meet are left as None.
+
+    @behaviors: behavior names, list position is the behavior ID
+    @interactions: rows of (behavior 1, behavior 2, chance 1, chance 2, exclusive)
+    @isolated: behaviors that only meet their own kind
+    """
+    ids = {behavior: i for i, behavior in enumerate(behaviors)}
+    n = len(behaviors)
+    survival = [[None] * n for _ in range(n)]
+    exclusive = [[False] * n for _ in range(n)]
+
+    for b1, b2, p1, p2, excl in interactions:
+        if b1 not in ids or b2 not in ids:
+            raise ValueError(f"Unknown behavior in interaction {b1}, {b2}")
+        if not (0 <= p1 <= 1 and 0 <= p2 <= 1):
+            raise ValueError(f"Survival chance out of range for {b1}, {b2}")
+        if excl and p1 + p2 != 1:
+            raise ValueError(f"Exclusive interaction {b1}, {b2} must have chances summing to 1")
+
+        # Fill in the given ordering and its mirror
+        cells = [(ids[b1], ids[b2], p1, p2)]
+        if b1 != b2:
+            cells.append((ids[b2], ids[b1], p2, p1))
+
+        for i, j, q1, q2 in cells:
+            if survival[i][j] is not None:
+                raise ValueError(f"Interaction {behaviors[i]}, {behaviors[j]} defined twice")
+            survival[i][j] = (q1, q2)
+            exclusive[i][j] = excl
+
+    # Every pair that can meet needs an outcome
+    for i, b1 in enumerate(behaviors):
+        for j, b2 in enumerate(behaviors):
+            can_meet = b1 == b2 or (b1 not in isolated and b2 not in isolated)
+            if can_meet and survival[i][j] is None:
+                raise ValueError(f"No predator interaction defined for 1: {b1}, 2: {b2}")
+
+    return survival, exclusive
+
+
+SURVIVAL, EXCLUSIVE = build_table(BEHAVIORS, INTERACTIONS, ISOLATED)
@@ -0,0 +1,101 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: live.py
+
+Live plot of a running simulation. The simulation runs in its own process and hands its records to
+the plot through a small bounded queue without ever waiting on it: whenever the queue is full the
+records pile up and go out together in the next batch. The plot redraws at a fixed frame rate,
+taking everything that arrived since the last frame in one go, so a slow redraw merges frames
+instead of slowing the simulation down. Closing the window stops the run.
+"""
+
+import multiprocessing
+import queue
+
+import matplotlib.pyplot as plt
+
+from main import SCENARIOS, iter_simulation
+from render import BEHAVIORS, BEHAVIOR_TITLES, COLORS
+from seeding import root_seed
+
+
+def _produce(records, scenario: str, params: dict, seed: int):
+    # Runs in the producer process. Never blocks on the queue until the run is over.
+    pending = []
+    for record in iter_simulation(scenario, **params, rng=seed):
+        pending.append(record)
+        try:
+            records.put_nowait(pending)
+        except queue.Full:
+            # The plot is behind, merge into the next batch
+            continue
+        pending = []
+
+    records.put(pending)
+    records.put(None)
+
+
+def watch(scenario: str, gens: int, size: int, predator_rate: float, reprod_rate: float, trees: int | None = None,
+          rng: int | None = None, fps: float = 10, maxsize: int = 4, keep_open: bool = True) -> list[dict]:
+    """
+    Runs a scenario in a background process while plotting its tracked proportions (population
+    size for baseline) as they come in. Returns the records received, which is all of them unless
+    the window was closed early.
+
+    @rng: seed for the run, a fresh root seed if None
+    @fps: redraws per second
+    @maxsize: batches the queue holds before the producer starts merging them
+    @keep_open: leave the window up once the run is over, until it is closed
+    """
+    tracked = SCENARIOS[scenario].tracked
+    metrics = tracked or ['population']
+    titles = dict(zip(BEHAVIORS, BEHAVIOR_TITLES), population='Population')
+    colors = dict(zip(BEHAVIORS, COLORS), population='blue')
+
+    records = multiprocessing.Queue(maxsize)
+    params = {'gens': gens, 'size': size, 'predator_rate': predator_rate, 'reprod_rate': reprod_rate, 'trees': trees}
+    producer = multiprocessing.Process(
+        target=_produce, args=(records, scenario, params, root_seed() if rng is None else rng), daemon=True,
+    )
+    producer.start()
+
+    fig, ax = plt.subplots()
+    lines = {m: ax.plot([], [], color=colors[m], label=titles[m])[0] for m in metrics}
+    ax.set_xlim(0, gens)
+    if tracked:
+        ax.set_ylim(0, 1)
+    ax.legend(facecolor="white", framealpha=1)
+    ax.set_title(f"Population Distribution, Predator rate: {predator_rate}")
+    ax.set_ylabel("Proportion" if tracked else "Population")
+    ax.set_xlabel("Generation")
+
+    received = []
+    done = False
+    while not done and plt.fignum_exists(fig.number):
+        plt.pause(1 / fps)
+
+        # Take everything that came in since the last frame
+        try:
+            while (batch := records.get_nowait()) is not None:
+                received.extend(batch)
+            done = True
+        except queue.Empty:
+            pass
+
+        generations = [r['generation'] for r in received]
+        for metric, line in lines.items():
+            line.set_data(generations, [r[metric] for r in received])
+        if not tracked:
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+        fig.canvas.draw_idle()
+
+    if producer.is_alive():
+        producer.terminate()
+    producer.join()
+
+    # Leave the finished plot up until it is closed
+    if done and keep_open and plt.fignum_exists(fig.number):
+        plt.show()
+    plt.close(fig)
+    return received
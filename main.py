@@ -3,11 +3,22 @@ Author: Jay Turnsek, Liam Johnston
 Title: main.py
 
 Main driver script for a-life simulation.
+Run `python main.py --help` to see the batch runner options.
 """
 
+import os
 import random
-import matplotlib.pyplot as plt
-from matplotlib import animation
+import time
+from collections import Counter
+
+import profiling
+from interactions import BEHAVIOR_IDS, SURVIVAL, EXCLUSIVE
+from seeding import as_random, derive_seed, root_seed
+
+
+# Bump whenever a change makes any engine give different results for the same seed,
+# so results cached by older code (see cache.py) are never reused.
+ENGINE_VERSION = 1
 
 
 class Individual:
@@ -33,780 +44,748 @@ class Individual:
 
 
 # PREDATOR HANDING
-def handle_predator(ind1, ind2):
+def handle_predator(ind1, ind2, rng=random):
     """
     Handles behavior of predator interactions between two individuals;
-    Highly based on behavioral dynamics. 
+    Highly based on behavioral dynamics. Outcomes are looked up in the
+    interaction table (see interactions.py) by behavior ID.
 
     *** DEATH IS TREATED AS NOT GETTING FOOD; THUS NOT REPRODUCING. ***
 
     @ind1: first individual
     @ind2: Second individual
+    @rng: random number generator, the global random module by default
     """
-
-    if ind1.behavior == "base" and ind2.behavior == "base":
-        # 50/50 chance for baseline.
-        if random.random() < 0.5:
-            ind1.setFoodState(True)
-        else:
-            ind2.setFoodState(True)
-
-    elif ind1.behavior == "cowardice" and ind2.behavior == "cowardice":
-        # Selfish/cowardice behaviors result in a 75% chance of running away unscathed.
-        if random.random() < 0.75:
-            ind1.setFoodState(True)
-        if random.random() < 0.75:
-            ind2.setFoodState(True)
-
-    elif ind1.behavior == "altruist" and ind2.behavior == "altruist":
-        # One altruist individual will alert, the other gets away guarenteed.
-        # The one who alerts has a 50% chance of getting killed.
-        if random.random() < 0.5:
-            ind1.setFoodState(True)
-        ind2.setFoodState(True)
-
-    elif ind1.behavior == "cowardice" and ind2.behavior == "altruist":
-        # The altruist individual alerts letting the cowardice get away free,
-        # But altruist now has 50% chance of death.
-        ind1.setFoodState(True)
-        if random.random() < 0.5:
-            ind2.setFoodState(True)
-
-    elif ind1.behavior == "altruist" and ind2.behavior == "cowardice":
-        # The altruist individual alerts letting the cowardice get away free,
-        # But altruist now has 50% chance of death.
-        ind2.setFoodState(True)
-        if random.random() < 0.5:
-            ind1.setFoodState(True)
-
-    elif ind1.behavior == "gb_altruist" and ind2.behavior == "gb_altruist":
-        # The green beard altruist individual alerts letting the other get away free,
-        # But individual who alerted now has 50% chance of death.
-        if random.random() < 0.5:
-            ind1.setFoodState(True)
-        ind2.setFoodState(True)
-
-    elif ind1.behavior == "gb_altruist" and ind2.behavior == "cowardice":
-        # Since cowardice not same type as green beard altruist, no alert given;
-        # Both have 25% chance of death
-        if random.random() < 0.75:
-            ind1.setFoodState(True)
-        if random.random() < 0.75:
-            ind2.setFoodState(True)
-
-    elif ind1.behavior == "cowardice" and ind2.behavior == "gb_altruist":
-        # Since cowardice not same type as green beard altruist, no alert given;
-        # Both have 25% chance of death
-        if random.random() < 0.75:
-            ind1.setFoodState(True)
-        if random.random() < 0.75:
-            ind2.setFoodState(True)
-
-    elif ind1.behavior == "spite" and ind2.behavior == "cowardice":
-        # Spite alerts predator of cowardice's presence, raises cowardice's chance of death to 0.5.
-        if random.random() < 0.75:
-            ind1.setFoodState(True)
-        if random.random() < 0.5:
-            ind2.setFoodState(True)
-
-    elif ind1.behavior == "cowardice" and ind2.behavior == "spite":
-        # Spite alerts predator of cowardice's presence, raises cowardice's chance of death to 0.5.
-        if random.random() < 0.5:
-            ind1.setFoodState(True)
-        if random.random() < 0.75:
-            ind2.setFoodState(True)
-
-    elif ind1.behavior == "spite" and ind2.behavior == "spite":
-        # Since both here are spiteful, both of their chances of death go up.
-        if random.random() < 0.25:
-            ind1.setFoodState(True)
-        if random.random() < 0.25:
-            ind2.setFoodState(True)
-
-    elif ind1.behavior == "selective_spite" and ind2.behavior == "cowardice":
-        # Selective spite alerts predator of cowardice's presence, raises cowardice's chance of death to 0.5.
-        if random.random() < 0.75:
-            ind1.setFoodState(True)
-        if random.random() < 0.5:
-            ind2.setFoodState(True)
-
-    elif ind1.behavior == "cowardice" and ind2.behavior == "selective_spite":
-        # Selective spite alerts predator of cowardice's presence, raises cowardice's chance of death to 0.5.
-        if random.random() < 0.5:
-            ind1.setFoodState(True)
-        if random.random() < 0.75:
-            ind2.setFoodState(True)
-
-    elif ind1.behavior == "selective_spite" and ind2.behavior == "selective_spite":
-        # Since selective spite only alerts predator of other species' presence, both just run away.
-        if random.random() < 0.75:
-            ind1.setFoodState(True)
-        if random.random() < 0.75:
-            ind2.setFoodState(True)
-
-    elif ind1.behavior == "altruist" and ind2.behavior == "selective_spite":
-        # Altruist alerts selective spite to predator, and selective spite alerts predator of 
-        # altruist's presence. 0.75 death rate for altruist, selective spite gets away free.
-        if random.random() > 0.75:
-            ind1.setFoodState(True)
-        ind2.setFoodState(True)
-
-    elif ind1.behavior == "selective_spite" and ind2.behavior == "altruist":
-        # Altruist alerts selective spite to predator, and selective spite alerts predator of 
-        # altruist's presence. 0.75 death rate for altruist, selective spite gets away free.
-        if random.random() > 0.75:
-            ind2.setFoodState(True)
-        ind1.setFoodState(True)
-
-    elif ind1.behavior == "altruist" and ind2.behavior == "spite":
-        # Altruist alerts spite to predator, and selective spite alerts predator of 
-        # altruist's presence. 0.75 death rate for altruist, spite gets away free.
-        if random.random() > 0.75:
-            ind1.setFoodState(True)
-        ind2.setFoodState(True)
-
-    elif ind1.behavior == "spite" and ind2.behavior == "altruist":
-        # Altruist alerts spite to predator, and selective spite alerts predator of 
-        # altruist's presence. 0.75 death rate for altruist, spite gets away free.
-        if random.random() > 0.75:
-            ind2.setFoodState(True)
-        ind1.setFoodState(True)
-    
-    elif ind1.behavior == "selective_spite" and ind2.behavior == "gb_altruist":
-        # No alert given by green beard, and selective spite alerts predator of green
-        # beard's presence. 0.5 death rate for green beard, selective spite 0.25.
-        if random.random() < 0.5:
-            ind2.setFoodState(True)
-        if random.random() < 0.75:
-            ind1.setFoodState(True)
-    
-    elif ind1.behavior == "gb_altruist" and ind2.behavior == "selective_spite":
-        # No alert given by green beard, and selective spite alerts predator of green
-        # beard's presence. 0.5 death rate for green beard, selective spite 0.25.
-        if random.random() < 0.5:
-            ind1.setFoodState(True)
-        if random.random() < 0.75:
-            ind2.setFoodState(True)
-    
-    elif ind1.behavior == "selective_spite" and ind2.behavior == "spite":
-        # Spite exchanged both ways. Predator is notified of both, one dies one doesn't.
-        if random.random() < 0.5:
+    id1 = BEHAVIOR_IDS.get(ind1.behavior)
+    id2 = BEHAVIOR_IDS.get(ind2.behavior)
+    odds = None if id1 is None or id2 is None else SURVIVAL[id1][id2]
+    if odds is None:
+        raise ValueError(f"No predator interaction defined for 1: {ind1.behavior}, 2: {ind2.behavior}")
+
+    if EXCLUSIVE[id1][id2]:
+        # Exactly one of the two gets away.
+        if rng.random() < odds[0]:
             ind1.setFoodState(True)
         else:
             ind2.setFoodState(True)
-
-    elif ind1.behavior == "spite" and ind2.behavior == "selective_spite":
-        # Spite exchanged both ways. Predator is notified of both, one dies one doesn't.
-        if random.random() < 0.5:
+    else:
+        if rng.random() < odds[0]:
             ind1.setFoodState(True)
-        else:
+        if rng.random() < odds[1]:
             ind2.setFoodState(True)
 
-    elif ind1.behavior == "spite" and ind2.behavior == "gb_altruist":
-        # No alert given by green beard, spite alerts predator of green beard's presence.
-        # 0.25 death rate for spite, 0.5 for green beard.
-        if random.random() < 0.75:
-            ind1.setFoodState(True)
-        if random.random() < 0.5:
-            ind2.setFoodState(True)
 
-    elif ind1.behavior == "gb_altruist" and ind2.behavior == "spite":
-        # No alert given by green beard, spite alerts predator of green beard's presence.
-        # 0.25 death rate for spite, 0.5 for green beard.
-        if random.random() < 0.75:
-            ind2.setFoodState(True)
-        if random.random() < 0.5:
-            ind1.setFoodState(True)
+# GENERATION FUNCTIONS
+def do_generation(population: list[Individual], predator_rate: float, reprod_rate: float, tracked: list[str],
+                  trees: int | None = None, counts: Counter | None = None, rng=None):
+    """
+    One generation for any mix of behaviors: individuals pair up at trees, predators show up,
+    and everyone who got food may reproduce.
+
+    Returns the next generation, gen_metrics (share of population for each tracked behavior)
+    and the behavior counts of the next generation, which are kept up to date as children are
+    born. Passing those counts back in as counts on the next call skips rescanning the population.
+
+    @population: current generation
+    @predator_rate: chance a predator is present at a tree
+    @reprod_rate: chance an individual with food reproduces
+    @tracked: behaviors to report in gen_metrics
+    @trees: number of trees, only two individuals per tree get to forage. Unlimited if None
+    @counts: behavior counts of population, if already known
+    @rng: seed or random.Random to draw from, the global random module if None
+    """
+    rng = as_random(rng)
 
-    elif ind1.behavior == "gb_altruist" and ind2.behavior == "altruist":
-        # Altruist gives alert, green beard does not. 0.25 death rate for green beard, 0.5 death
-        # rate for altruist.
-        if random.random() < 0.75:
-            ind1.setFoodState(True)
-        if random.random() < 0.5:
-            ind2.setFoodState(True)
+    # Instrumentation, only when a profiler is active (see profiling.py)
+    prof = profiling.active
+    if prof is not None:
+        start = time.perf_counter()
 
-    elif ind1.behavior == "altruist" and ind2.behavior == "gb_altruist":
-        # Altruist gives alert, green beard does not. 0.25 death rate for green beard, 0.5 death
-        # rate for altruist.
-        if random.random() < 0.75:
-            ind2.setFoodState(True)
-        if random.random() < 0.5:
-            ind1.setFoodState(True)
-        
-    else:
-        print(f"1: {ind1.behavior}, 2: {ind2.behavior}")
-        exit()
+    # get randomized population. With a limited number of trees only two individuals
+    # per tree get to forage, the rest go without food.
+    foragers = len(population) if trees is None else min(len(population), 2 * trees)
+    shuffled = rng.sample(population, foragers)
 
-
-# GENERATION FUNCTIONS
-def do_generation_baseline(population: list[Individual], predator_rate: float, reprod_rate: float):
-    # get randomized population
-    shuffled = random.sample(population, len(population))
+    if prof is not None:
+        start = prof.lap('shuffle', start)
 
     # init next gen population
     next_gen = []
+    next_counts = Counter()
 
-    # Process every 2 pair of individuals; since each tree has two food
+    # Process every 2 pair of individuals; since each tree has two food (situation handling)
     for i, j in zip(shuffled[0::2], shuffled[1::2]):
 
-        # Determine if predator present
-        if random.random() <= predator_rate:
+        # Determine if there is a predator
+        if rng.random() <= predator_rate:
 
-            handle_predator(i, j)
+            if prof is None:
+                handle_predator(i, j, rng)
+            else:
+                predator_start = time.perf_counter()
+                handle_predator(i, j, rng)
+                prof.predator(i.behavior, j.behavior, time.perf_counter() - predator_start)
 
-        # Otherwise, both get food and stay alive
+        # Otherwise, both get food and to live
         else:
             i.setFoodState(True)
             j.setFoodState(True)
 
-    # Reproduction process.
-    food_count = 0
+    if prof is not None:
+        start = prof.lap('pairing', start)
+
+    # Do reproduction, counting children as they are born
     for i in shuffled:
         if i.hasFood():
-            food_count += 1
-            if random.random() < reprod_rate:
-                # reproduce, osmosis style. only if food was grabbed.
-                child1 = Individual("base")
-                child2 = Individual("base")
-                next_gen.append(child1)
-                next_gen.append(child2)
-
-    return next_gen, len(next_gen)
-
-
-def do_generation_cowardice_altruist(population: list[Individual], predator_rate: float, reprod_rate: float):
-    # get randomized population
-    shuffled = random.sample(population, len(population))
-
-    # init next gen population
-    next_gen = []
-
-    # Process every 2 pair of individuals; since each tree has two food (situation handling)
-    for i, j in zip(shuffled[0::2], shuffled[1::2]):
+            if rng.random() < reprod_rate:
+                # reproduce, osmosis style. only if food was grabbed
+                next_gen.append(Individual(i.behavior))
+                next_gen.append(Individual(i.behavior))
+                next_counts[i.behavior] += 2
 
-        # Determine if predator present
-        if random.random() <= predator_rate:
+    if prof is not None:
+        start = prof.lap('reproduction', start)
 
-            handle_predator(i, j)
+    # Metrics for plot, a single pass over the population if counts weren't given
+    if counts is None:
+        counts = Counter(individual.behavior for individual in population)
+    # An extinct population has a share of 0 for everything
+    gen_metrics = {b: counts[b] / len(population) if population else 0.0 for b in tracked}
 
-        # Otherwise both get food and live
-        else:
-            i.setFoodState(True)
-            j.setFoodState(True)
+    if prof is not None:
+        prof.lap('metrics', start)
+        prof.end_generation(len(next_gen))
 
-    # Do reproduction for population
-    food_count = 0
-    for i in shuffled:
-        if i.hasFood():
-            food_count += 1
-            if random.random() < reprod_rate:
-                # reproduce, osmosis style. only if food was grabbed
-                child1 = Individual(i.behavior)
-                child2 = Individual(i.behavior)
-                next_gen.append(child1)
-                next_gen.append(child2)
+    return next_gen, gen_metrics, next_counts
 
-    # Metrics for proportion plot
-    cowardice_count, altruist_count = 0, 0
-    for individual in population:
-        if individual.behavior == "cowardice":
-            cowardice_count += 1
-        if individual.behavior == "altruist":
-            altruist_count += 1
 
-    return next_gen, cowardice_count / len(population), altruist_count / len(population)
+def do_generation_baseline(population: list[Individual], predator_rate: float, reprod_rate: float,
+                           trees: int | None = None, rng=None):
+    next_gen, _, _ = do_generation(population, predator_rate, reprod_rate, [], trees, rng=rng)
+    return next_gen, len(next_gen)
 
 
-def do_generation_gb_cowardice(population: list[Individual], predator_rate: float, reprod_rate: float):
-    # get randomized population
-    shuffled = random.sample(population, len(population))
+def do_generation_cowardice_altruist(population: list[Individual], predator_rate: float, reprod_rate: float,
+                                     trees: int | None = None, rng=None):
+    next_gen, gen_metrics, _ = do_generation(population, predator_rate, reprod_rate, ['cowardice', 'altruist'], trees, rng=rng)
+    return next_gen, gen_metrics['cowardice'], gen_metrics['altruist']
 
-    # init next gen population
-    next_gen = []
 
-    # Process every 2 pair of individuals; since each tree has two food (situation handling)
-    for i, j in zip(shuffled[0::2], shuffled[1::2]):
+def do_generation_gb_cowardice(population: list[Individual], predator_rate: float, reprod_rate: float,
+                               trees: int | None = None, rng=None):
+    next_gen, gen_metrics, _ = do_generation(population, predator_rate, reprod_rate, ['cowardice', 'gb_altruist'], trees, rng=rng)
+    return next_gen, gen_metrics['cowardice'], gen_metrics['gb_altruist']
 
-        # Determine if there is a predator
-        if random.random() <= predator_rate:
 
-            handle_predator(i, j)
+def do_generation_spite_cowardice(population: list[Individual], predator_rate: float, reprod_rate: float,
+                                  trees: int | None = None, rng=None):
+    next_gen, gen_metrics, _ = do_generation(population, predator_rate, reprod_rate, ['cowardice', 'spite'], trees, rng=rng)
+    return next_gen, gen_metrics['cowardice'], gen_metrics['spite']
 
-        # Otherwise, both get food and to live
-        else:
-            i.setFoodState(True)
-            j.setFoodState(True)
 
-    # Do reproduction
-    food_count = 0
-    for i in shuffled:
-        if i.hasFood():
-            food_count += 1
-            if random.random() < reprod_rate:
-                # reproduce, osmosis style. only if food was grabbed
-                child1 = Individual(i.behavior)
-                child2 = Individual(i.behavior)
-                next_gen.append(child1)
-                next_gen.append(child2)
+def do_generation_selectivespite_cowardice(population: list[Individual], predator_rate: float, reprod_rate: float,
+                                           trees: int | None = None, rng=None):
+    next_gen, gen_metrics, _ = do_generation(population, predator_rate, reprod_rate, ['cowardice', 'selective_spite'], trees, rng=rng)
+    return next_gen, gen_metrics['cowardice'], gen_metrics['selective_spite']
 
-    # Metrics for plot
-    cowardice_count, altruist_count = 0, 0
-    for individual in population:
-        if individual.behavior == "cowardice":
-            cowardice_count += 1
-        if individual.behavior == "gb_altruist":
-            altruist_count += 1
 
-    return next_gen, cowardice_count / len(next_gen), altruist_count / len(next_gen)
+def do_generation_full(population: list[Individual], predator_rate: float, reprod_rate: float,
+                       trees: int | None = None, rng=None):
+    behaviors = ['cowardice', 'altruist', 'gb_altruist', 'spite', 'selective_spite']
+    next_gen, gen_metrics, _ = do_generation(population, predator_rate, reprod_rate, behaviors, trees, rng=rng)
+    return next_gen, gen_metrics
 
 
-def do_generation_spite_cowardice(population: list[Individual], predator_rate: float, reprod_rate: float):
-    # get randomized population
-    shuffled = random.sample(population, len(population))
+# SCENARIO REGISTRY
+class Scenario:
+    '''
+    A named simulation setup: the behaviors in the initial (evenly split) population, the behaviors
+    whose proportions it tracks and the scenario's default parameters.
+    '''
+    def __init__(self, name: str, behaviors: list[str], tracked: list[str], defaults: dict | None = None):
+        self.name = name
+        self.behaviors = behaviors
+        self.tracked = tracked
+        self.defaults = {**DEFAULT_PARAMS, **(defaults or {})}
 
-    # init next gen population
-    next_gen = []
 
-    # Process every 2 pair of individuals; since each tree has two food (situation handling)
-    for i, j in zip(shuffled[0::2], shuffled[1::2]):
+    def __repr__(self):
+        return f'Scenario {self.name} with {", ".join(self.behaviors)} behaviors'
 
-        # Determine if there is a predator
-        if random.random() <= predator_rate:
 
-            handle_predator(i, j)
+# Parameters used when a scenario or caller doesn't give one.
+DEFAULT_PARAMS = {'gens': 50, 'size': 50, 'predator_rate': 0.7, 'reprod_rate': 0.7, 'trees': None}
 
-        # Otherwise, both get food and to live
-        else:
-            i.setFoodState(True)
-            j.setFoodState(True)
+SCENARIOS = {}
 
-    # Do reproduction
-    food_count = 0
-    for i in shuffled:
-        if i.hasFood():
-            food_count += 1
-            if random.random() < reprod_rate:
-                # reproduce, osmosis style. only if food was grabbed
-                child1 = Individual(i.behavior)
-                child2 = Individual(i.behavior)
-                next_gen.append(child1)
-                next_gen.append(child2)
 
-    # Metrics for plot
-    cowardice_count, spite_count = 0, 0
-    for individual in population:
-        if individual.behavior == "cowardice":
-            cowardice_count += 1
-        if individual.behavior == "spite":
-            spite_count += 1
+def register_scenario(scenario: Scenario) -> Scenario:
+    # Add a scenario to the registry, by name
+    SCENARIOS[scenario.name] = scenario
+    return scenario
 
-    return next_gen, cowardice_count / len(population), spite_count / len(population)
 
+register_scenario(Scenario(
+    'baseline', ['base'], [],
+))
+register_scenario(Scenario(
+    'cowardice_altruist', ['cowardice', 'altruist'], ['cowardice', 'altruist'], {'reprod_rate': 0.6},
+))
+register_scenario(Scenario(
+    'gb_cowardice', ['cowardice', 'gb_altruist'], ['cowardice', 'gb_altruist'], {'reprod_rate': 0.6},
+))
+register_scenario(Scenario(
+    'spite_cowardice', ['cowardice', 'spite'], ['cowardice', 'spite'],
+))
+register_scenario(Scenario(
+    'selectivespite_cowardice', ['cowardice', 'selective_spite'], ['cowardice', 'selective_spite'],
+    {'reprod_rate': 0.6},
+))
+register_scenario(Scenario(
+    'full', ['cowardice', 'altruist', 'gb_altruist', 'spite', 'selective_spite'],
+    ['cowardice', 'altruist', 'gb_altruist', 'spite', 'selective_spite'],
+))
 
-def do_generation_selectivespite_cowardice(population: list[Individual], predator_rate: float, reprod_rate: float):
-    # get randomized population
-    shuffled = random.sample(population, len(population))
 
-    # init next gen population
-    next_gen = []
+# SIMULATION FUNCTIONS
+def initial_population(size: int, behaviors: list[str]) -> list[Individual]:
+    # Even split of the given behaviors
+    return [Individual(behaviors[i % len(behaviors)]) for i in range(size)]
 
-    # Process every 2 pair of individuals; since each tree has two food (situation handling)
-    for i, j in zip(shuffled[0::2], shuffled[1::2]):
 
-        # Determine if there is a predator
-        if random.random() <= predator_rate:
+# ABSORBING STATES
+def is_absorbed(counts: Counter, behaviors: list[str]) -> bool:
+    """
+    True once a population can no longer change makeup: it is extinct, or (in a scenario
+    that starts with more than one behavior) only one behavior is left.
 
-            handle_predator(i, j)
+    @counts: behavior counts of the population, with no zero entries
+    @behaviors: behaviors the scenario started with
+    """
+    alive = sum(1 for n in counts.values() if n)
+    return alive == 0 or (alive == 1 and len(behaviors) > 1)
 
-        # Otherwise, both get food and to live
-        else:
-            i.setFoodState(True)
-            j.setFoodState(True)
 
-    # Do reproduction
-    food_count = 0
-    for i in shuffled:
-        if i.hasFood():
-            food_count += 1
-            if random.random() < reprod_rate:
-                # reproduce, osmosis style. only if food was grabbed
-                child1 = Individual(i.behavior)
-                child2 = Individual(i.behavior)
-                next_gen.append(child1)
-                next_gen.append(child2)
-
-    # Metrics for plot
-    cowardice_count, selectivespite_count = 0, 0
-    for individual in population:
-        if individual.behavior == "cowardice":
-            cowardice_count += 1
-        if individual.behavior == "selective_spite":
-            selectivespite_count += 1
-
-    return (
-        next_gen,
-        cowardice_count / len(population),
-        selectivespite_count / len(population),
-    )
+def expected_size(behavior: str, size: int, predator_rate: float, reprod_rate: float,
+                  trees: int | None = None) -> float:
+    """
+    Expected size of the next generation of a population made up only of behavior.
+    Pairs are fed unless a predator shows up, in which case each survives with its odds
+    from the interaction table; every fed individual has two children with chance reprod_rate.
+    """
+    foragers = size if trees is None else min(size, 2 * trees)
+    pairs = foragers // 2
+    b = BEHAVIOR_IDS[behavior]
+    survive1, survive2 = SURVIVAL[b][b]
+    fed = pairs * (2 * (1 - predator_rate) + predator_rate * (survive1 + survive2))
+    return 2 * reprod_rate * fed
 
 
-def do_generation_full(population: list[Individual], predator_rate: float, reprod_rate: float):
-    # get randomized population
-    shuffled = random.sample(population, len(population))
+def absorbed_records(counts: Counter, tracked: list[str], start: int, gens: int, predator_rate: float,
+                     reprod_rate: float, trees: int | None = None):
+    """
+    Records for generations start..gens-1 of a population that is already absorbed. Shares stay
+    fixed from here on, so they are exact. After extinction the size stays 0; after fixation it
+    follows the expected size (rounded), since only the size is still random.
 
-    # init next gen population
-    next_gen = []
+    @counts: behavior counts of the absorbed population
+    """
+    fixed = next((b for b, n in counts.items() if n), None)
+    size = sum(counts.values())
 
-    # Process every 2 pair of individuals; since each tree has two food (situation handling)
-    for i, j in zip(shuffled[0::2], shuffled[1::2]):
+    for generation in range(start, gens):
+        shares = {b: float(b == fixed) if size else 0.0 for b in tracked}
+        if size:
+            size = round(expected_size(fixed, size, predator_rate, reprod_rate, trees))
+        yield {'generation': generation, **shares, 'population': size}
 
-        # Determine if there is a predator
-        if random.random() <= predator_rate:
 
-            handle_predator(i, j)
+def absorption(records: list[dict], tracked: list[str]) -> tuple[int, str] | None:
+    """
+    When a run got absorbed, from its records (which may be read back from a CSV).
+    Returns (generation, outcome): the generation whose offspring were all one behavior
+    (outcome is that behavior) or none at all (outcome is 'extinction'). None if neither happened.
 
-        # Otherwise, both get food and to live
-        else:
-            i.setFoodState(True)
-            j.setFoodState(True)
+    @records: metrics records; without a 'population' key (e.g. a do_simulation_* result),
+              extinction shows up as every tracked share dropping to 0
+    @tracked: the scenario's tracked behaviors. Fixation can't be seen without them
+    """
+    for i, record in enumerate(records):
+        # Shares are of the population entering a generation, so they show absorption one record late
+        if i > 0:
+            shares = [float(record[b]) for b in tracked]
+            for b, share in zip(tracked, shares):
+                if share == 1.0:
+                    return int(records[i - 1]['generation']), b
+            if 'population' not in record and shares and not any(shares):
+                return int(records[i - 1]['generation']), 'extinction'
+        if 'population' in record and int(record['population']) == 0:
+            return int(record['generation']), 'extinction'
+    return None
+
+
+def iter_simulation(scenario: str, gens: int, size: int, predator_rate: float, reprod_rate: float,
+                    trees: int | None = None, rng=None, stop_early: bool = True, state: dict | None = None):
+    """
+    Generator form of the simulation functions. Yields one metrics record per generation,
+    e.g. {'generation': 0, 'cowardice': 0.5, 'spite': 0.5, 'population': 48}, and only ever
+    holds the current population in memory. Tracked behaviors are shares of the population
+    entering the generation, population is the size of the generation it produced.
+
+    @scenario: name of a registered scenario, e.g. 'full' or 'spite_cowardice'
+    @rng: seed or random.Random for this run, the global random module if None
+    @stop_early: once the population goes extinct or a single behavior takes over, fill the rest
+                 of the run in analytically (see absorbed_records) instead of simulating it
+    @state: dict of 'population', 'counts' (its behavior counts, None if unknown), 'generation'
+            (the next one to run) and 'absorption'. The run resumes from it if it is filled in,
+            starts fresh if empty, and keeps it up to date after every generation (see checkpoint.py).
+            absorption is None until the run is absorbed, then (generation, outcome) as in absorption()
+    """
+    rng = as_random(rng)
+    scenario = SCENARIOS[scenario]
+    if state is None:
+        state = {}
+    if not state:
+        state.update(
+            population=initial_population(size, scenario.behaviors), counts=None, generation=0, absorption=None,
+        )
+    population, counts = state['population'], state['counts']
+
+    for generation in range(state['generation'], gens):
+        # Nothing left to simulate once the population is extinct or down to one behavior
+        if stop_early and counts is not None and is_absorbed(counts, scenario.behaviors):
+            state['generation'] = gens
+            yield from absorbed_records(
+                counts, scenario.tracked, generation, gens, predator_rate, reprod_rate, trees
+            )
+            return
+
+        # Do generation, carrying the child counts over so the population is never rescanned
+        population, gen_metrics, counts = do_generation(
+            population, predator_rate, reprod_rate, scenario.tracked, trees, counts, rng
+        )
+        state.update(population=population, counts=counts, generation=generation + 1)
+        if state['absorption'] is None and is_absorbed(counts, scenario.behaviors):
+            state['absorption'] = (generation, next((b for b, n in counts.items() if n), 'extinction'))
 
-    # Do reproduction
-    food_count = 0
-    for i in shuffled:
-        if i.hasFood():
-            food_count += 1
-            if random.random() < reprod_rate:
-                # reproduce, osmosis style. only if food was grabbed
-                child1 = Individual(i.behavior)
-                child2 = Individual(i.behavior)
-                next_gen.append(child1)
-                next_gen.append(child2)
-
-    # Metrics for plot
-    cowardice_count = 0
-    altruist_count = 0
-    gbaltruist_count = 0
-    spite_count = 0
-    selspite_count = 0
-
-    for individual in population:
-        if individual.behavior == "cowardice":
-            cowardice_count += 1
-        if individual.behavior == "altruist":
-            altruist_count += 1
-        if individual.behavior == "gb_altruist":
-            gbaltruist_count += 1
-        if individual.behavior == "spite":
-            spite_count += 1
-        if individual.behavior == "selective_spite":
-            selspite_count += 1
-
-    gen_metrics = {
-        'cowardice': cowardice_count / len(population),
-        'altruist': altruist_count / len(population),
-        'gb_altruist': gbaltruist_count / len(population),
-        'spite': spite_count / len(population),
-        'selective_spite': selspite_count / len(population),
-        
-
-    }
-    return (
-        next_gen,
-        gen_metrics
-    )
+        yield {'generation': generation, **gen_metrics, 'population': len(population)}
 
-# SIMULATION FUNCTIONS
-def do_simulation_baseline(gens: int, size: int, predator_rate: float, reprod_rate: float):
 
-    # Initialize population
-    population = [Individual("base") for _ in range(size)]
+def do_simulation_baseline(gens: int, size: int, predator_rate: float, reprod_rate: float,
+                           trees: int | None = None, rng=None):
 
+    # Save population growth
     sizes = []
-    for _ in range(gens):
-
-        # Do generation, save population growth
-        population, cur_size = do_generation_baseline(
-            population, predator_rate, reprod_rate
-        )
-        sizes.append(cur_size)
+    for record in iter_simulation('baseline', gens, size, predator_rate, reprod_rate, trees, rng):
+        sizes.append(record['population'])
 
     return sizes
 
 
-def do_simulation_cowardice_altruist(gens: int, size: int, predator_rate: float, reprod_rate: float):
-
-    # Init population, 50/50 split of cowardice and altruist
-    population = []
-    for i in range(size):
-        if i % 2 == 0:
-            population.append(Individual("cowardice"))
-        else:
-            population.append(Individual("altruist"))
+def do_simulation_cowardice_altruist(gens: int, size: int, predator_rate: float, reprod_rate: float,
+                                     trees: int | None = None, rng=None):
 
+    # Save proportions for plotting later
     cowardice, altruist = [], []
-    for _ in range(gens):
-
-        # Do generation, save proportions for plotting later
-        population, cowardice_cur, altruist_cur = do_generation_cowardice_altruist(
-            population, predator_rate, reprod_rate
-        )
-        cowardice.append(cowardice_cur)
-        altruist.append(altruist_cur)
+    for record in iter_simulation('cowardice_altruist', gens, size, predator_rate, reprod_rate, trees, rng):
+        cowardice.append(record['cowardice'])
+        altruist.append(record['altruist'])
 
     return cowardice, altruist
 
 
-def do_simulation_gb_cowardice(gens: int, size: int, predator_rate: float, reprod_rate: float):
-
-    # Init population, 50/50 split of cowardice and green beard altruist
-    population = []
-    for i in range(size):
-        if i % 2 == 0:
-            population.append(Individual("cowardice"))
-        else:
-            population.append(Individual("gb_altruist"))
+def do_simulation_gb_cowardice(gens: int, size: int, predator_rate: float, reprod_rate: float,
+                               trees: int | None = None, rng=None):
 
+    # Save proportions for plotting later
     cowardice, altruist = [], []
-    for _ in range(gens):
-
-        # Do generation, save proportions for plotting later
-        population, cowardice_cur, altruist_cur = do_generation_gb_cowardice(
-            population, predator_rate, reprod_rate
-        )
-        cowardice.append(cowardice_cur)
-        altruist.append(altruist_cur)
+    for record in iter_simulation('gb_cowardice', gens, size, predator_rate, reprod_rate, trees, rng):
+        cowardice.append(record['cowardice'])
+        altruist.append(record['gb_altruist'])
 
     return cowardice, altruist
 
 
-def do_simulation_spite_cowardice(gens: int, size: int, predator_rate: float, reprod_rate: float):
-
-    # Init population, 50/50 split of cowardice and green beard altruist
-    population = []
-    for i in range(size):
-        if i % 2 == 0:
-            population.append(Individual("cowardice"))
-        else:
-            population.append(Individual("spite"))
+def do_simulation_spite_cowardice(gens: int, size: int, predator_rate: float, reprod_rate: float,
+                                  trees: int | None = None, rng=None):
 
+    # Save proportions for plotting later
     cowardice, spite = [], []
-    for _ in range(gens):
-        # Do generation, save proportions for plotting later
-        population, cowardice_cur, spite_cur = do_generation_spite_cowardice(
-            population, predator_rate, reprod_rate
-        )
-        cowardice.append(cowardice_cur)
-        spite.append(spite_cur)
+    for record in iter_simulation('spite_cowardice', gens, size, predator_rate, reprod_rate, trees, rng):
+        cowardice.append(record['cowardice'])
+        spite.append(record['spite'])
 
     return cowardice, spite
 
 
-def do_simulation_selectivespite_cowardice(gens: int, size: int, predator_rate: float, reprod_rate: float):
-
-    # Init population, 50/50 split of cowardice and green beard altruist
-    population = []
-    for i in range(size):
-        if i % 2 == 0:
-            population.append(Individual("cowardice"))
-        else:
-            population.append(Individual("selective_spite"))
+def do_simulation_selectivespite_cowardice(gens: int, size: int, predator_rate: float, reprod_rate: float,
+                                           trees: int | None = None, rng=None):
 
+    # Save proportions for plotting later
     cowardice, selectivespite = [], []
-    for _ in range(gens):
-        # Do generation, save proportions for plotting later
-        (
-            population,
-            cowardice_cur,
-            selectivespite_cur,
-        ) = do_generation_selectivespite_cowardice(
-            population, predator_rate, reprod_rate
-        )
-        cowardice.append(cowardice_cur)
-        selectivespite.append(selectivespite_cur)
+    for record in iter_simulation('selectivespite_cowardice', gens, size, predator_rate, reprod_rate, trees, rng):
+        cowardice.append(record['cowardice'])
+        selectivespite.append(record['selective_spite'])
 
     return cowardice, selectivespite
 
 
-def do_simulation_full(gens: int, size: int, predator_rate: float, reprod_rate: float):
+def do_simulation_full(gens: int, size: int, predator_rate: float, reprod_rate: float,
+                       trees: int | None = None, rng=None):
 
-    # Init population, with even split of all behavior types.
-    behaviors  = ['cowardice', 'altruist', 'gb_altruist', 'spite', 'selective_spite']
+    # Save proportions for plotting later
+    behaviors = SCENARIOS['full'].tracked
     metrics = {b: [] for b in behaviors}
-    population = []
+    for record in iter_simulation('full', gens, size, predator_rate, reprod_rate, trees, rng):
+        for b in behaviors:
+            metrics[b].append(record[b])
 
-    for i in range(size):
-        population.append(Individual(behaviors[i % len(behaviors)]))
+    return metrics
 
 
-    for _ in range(gens):
-        # Do generation, save proportions for plotting later
-        population, cur_metrics = do_generation_full(
-            population, predator_rate, reprod_rate
-        )
+# RUNNABLE FUNCTIONS
+# matplotlib is only imported inside these, so the simulation core above imports without it.
+# Each takes the result of its do_simulation_* function, and runs it itself if not given.
+# params are the run's parameters (the scenario's defaults for any not given), out the directory
+# the figures are saved in.
 
-        # Add to metrics dict
-        for b in behaviors:
-            metrics[b].append(cur_metrics[b])
+def _plot_params(scenario: str, params: dict | None) -> dict:
+    # Parameters of a figure's run, the scenario's defaults for anything not given
+    return {**SCENARIOS[scenario].defaults, **(params or {})}
 
-    return metrics
 
+def baseline(metrics=None, params: dict | None = None, out: str = '.'):
+    import matplotlib.pyplot as plt
 
-# RUNNABLE FUNCTIONS
-def baseline():
-    # Baseline
-    metrics = do_simulation_baseline(N_GENS, POP_SIZE, PRED_RATE, REPROD_RATE)
+    # Baseline, unless already run (e.g. read back from a CSV, see figures.py)
+    params = _plot_params('baseline', params)
+    if metrics is None:
+        metrics = do_simulation_baseline(**params)
+    gens = range(len(metrics))
 
     # Plot results
-    plt.style.use("seaborn-darkgrid")
-    plt.plot(range(N_GENS), metrics, label="Population", color="blue")
-    plt.fill_between(range(N_GENS), 0, metrics, color="blue")
+    plt.style.use("seaborn-v0_8-darkgrid")
+    plt.plot(gens, metrics, label="Population", color="blue")
+    plt.fill_between(gens, 0, metrics, color="blue")
     plt.legend()
     plt.title("Population Growth Baseline")
     plt.ylabel("Population")
     plt.xlabel("Generation")
-    plt.savefig("baseline.png")
+    plt.savefig(os.path.join(out, "baseline.png"))
     plt.clf()
 
 
-def altruist_cowardice():
+def altruist_cowardice(metrics=None, params: dict | None = None, out: str = '.'):
+    import matplotlib.pyplot as plt
+
     # Cowardice vs. Altruist
-    pop1, pop2 = do_simulation_cowardice_altruist(N_GENS, POP_SIZE, PRED_RATE, 0.6)
+    params = _plot_params('cowardice_altruist', params)
+    if metrics is None:
+        metrics = do_simulation_cowardice_altruist(**params)
+    pop1, pop2 = metrics
+    gens = range(len(pop2))
+    top_prop = [1] * len(gens)
 
     # Plot results
-    plt.plot(range(N_GENS), TOP_PROP, label="Cowardice Proportion", color="red")
-    plt.plot(range(N_GENS), pop2, label="Altruist Proportion", color="yellow")
-    plt.fill_between(range(N_GENS), TOP_PROP, pop2, color="red")
-    plt.fill_between(range(N_GENS), pop2, 0, color="yellow")
+    plt.plot(gens, top_prop, label="Cowardice Proportion", color="red")
+    plt.plot(gens, pop2, label="Altruist Proportion", color="yellow")
+    plt.fill_between(gens, top_prop, pop2, color="red")
+    plt.fill_between(gens, pop2, 0, color="yellow")
     plt.ylim(0, 1.2)
     plt.legend(facecolor="white", framealpha=1)
     plt.title("Population Distribution")
     plt.ylabel("Proportion")
     plt.xlabel("Generation")
-    plt.savefig("cowardice_altruist.png")
+    plt.savefig(os.path.join(out, "cowardice_altruist.png"))
     plt.clf()
 
 
-def greenbeard_cowardice():
+def greenbeard_cowardice(metrics=None, params: dict | None = None, out: str = '.'):
+    import matplotlib.pyplot as plt
+
     # Green Beard Altruist vs Cowardice
-    pop1, pop2 = do_simulation_gb_cowardice(N_GENS, POP_SIZE, PRED_RATE, 0.6)
+    params = _plot_params('gb_cowardice', params)
+    if metrics is None:
+        metrics = do_simulation_gb_cowardice(**params)
+    pop1, pop2 = metrics
+    gens = range(len(pop2))
+    top_prop = [1] * len(gens)
 
     # Plot results
-    plt.plot(range(N_GENS), TOP_PROP, label="Cowardice", color="red")
-    plt.plot(range(N_GENS), pop2, label="Green Beard Altruist", color="green")
-    plt.fill_between(range(N_GENS), TOP_PROP, pop2, color="red")
-    plt.fill_between(range(N_GENS), pop2, 0, color="green")
+    plt.plot(gens, top_prop, label="Cowardice", color="red")
+    plt.plot(gens, pop2, label="Green Beard Altruist", color="green")
+    plt.fill_between(gens, top_prop, pop2, color="red")
+    plt.fill_between(gens, pop2, 0, color="green")
     plt.ylim(0, 1.2)
     plt.legend(facecolor="white", framealpha=1)
     plt.title("Population Distribution")
     plt.ylabel("Proportion")
     plt.xlabel("Generation")
-    plt.savefig("cowardice_gbaltruist.png")
+    plt.savefig(os.path.join(out, "cowardice_gbaltruist.png"))
     plt.clf()
 
 
-def spite_cowardice():
+def spite_cowardice(metrics=None, params: dict | None = None, out: str = '.'):
+    import matplotlib.pyplot as plt
+
     # Spite vs Cowardice
-    pop1, pop2 = do_simulation_spite_cowardice(N_GENS, POP_SIZE, PRED_RATE, REPROD_RATE)
+    params = _plot_params('spite_cowardice', params)
+    if metrics is None:
+        metrics = do_simulation_spite_cowardice(**params)
+    pop1, pop2 = metrics
+    gens = range(len(pop2))
+    top_prop = [1] * len(gens)
     # Plot results
-    plt.plot(range(N_GENS), TOP_PROP, label="Cowardice", color="red")
-    plt.plot(range(N_GENS), pop2, label="Spite", color="purple")
-    plt.fill_between(range(N_GENS), TOP_PROP, pop2, color="red")
-    plt.fill_between(range(N_GENS), pop2, 0, color="purple")
+    plt.plot(gens, top_prop, label="Cowardice", color="red")
+    plt.plot(gens, pop2, label="Spite", color="purple")
+    plt.fill_between(gens, top_prop, pop2, color="red")
+    plt.fill_between(gens, pop2, 0, color="purple")
     plt.ylim(0, 1.2)
     plt.legend(facecolor="white", framealpha=1)
     plt.title("Population Distribution")
     plt.ylabel("Proportion")
     plt.xlabel("Generation")
-    plt.savefig("spite_cowardice.png")
+    plt.savefig(os.path.join(out, "spite_cowardice.png"))
     plt.clf()
 
 
-def selectivespite_cowardice():
+def selectivespite_cowardice(metrics=None, params: dict | None = None, out: str = '.'):
+    import matplotlib.pyplot as plt
+
     # Selective Spite vs Cowardice
-    pop1, pop2 = do_simulation_selectivespite_cowardice(
-        N_GENS, POP_SIZE, PRED_RATE, 0.6
-    )
+    params = _plot_params('selectivespite_cowardice', params)
+    if metrics is None:
+        metrics = do_simulation_selectivespite_cowardice(**params)
+    pop1, pop2 = metrics
+    gens = range(len(pop2))
+    top_prop = [1] * len(gens)
     # Plot results
-    # plt.plot(range(N_GENS), TOP_PROP, label="Cowardice", color="red")
-    plt.plot(range(N_GENS), pop1, color="magenta")
-    plt.fill_between(range(N_GENS), TOP_PROP, pop2, color="red", label="Cowardice")
-    plt.fill_between(range(N_GENS), pop2, 0, color="magenta", label="Selective Spite")
+    # plt.plot(gens, top_prop, label="Cowardice", color="red")
+    plt.plot(gens, pop1, color="magenta")
+    plt.fill_between(gens, top_prop, pop2, color="red", label="Cowardice")
+    plt.fill_between(gens, pop2, 0, color="magenta", label="Selective Spite")
     plt.ylim(0, 1.2)
     plt.legend(facecolor="white", framealpha=1)
     plt.title("Population Distribution")
     plt.ylabel("Proportion")
     plt.xlabel("Generation")
-    plt.savefig("selectivespite_cowardice.png")
+    plt.savefig(os.path.join(out, "selectivespite_cowardice.png"))
+    plt.clf()
+
 
+def full_sim(metrics=None, params: dict | None = None, out: str = '.', every: int = 1):
+    import matplotlib.pyplot as plt
+    from render import save_animation
 
-def full_sim():
     # Run full simulation with all species involved.
-    metrics = do_simulation_full(
-        N_GENS, POP_SIZE, PRED_RATE, REPROD_RATE
-    )
-    
+    params = _plot_params('full', params)
+    if metrics is None:
+        metrics = do_simulation_full(**params)
+
     # Plot results
     behaviors  = ['cowardice', 'altruist', 'gb_altruist', 'spite', 'selective_spite']
     behavior_titles = ['Cowardice', 'Altruist', 'Green Beard Altruist', 'Spite', 'Selective Spite']
     colors = ['red', 'yellow', 'green', 'purple', 'magenta']
-    plt.style.use('seaborn-darkgrid')
+    gens = range(len(metrics[behaviors[0]]))
+    plt.style.use('seaborn-v0_8-darkgrid')
     for behavior, color, behavior_title in zip(behaviors, colors, behavior_titles):
-        plt.plot(range(N_GENS), metrics[behavior], color=color, label=behavior_title)
+        plt.plot(gens, metrics[behavior], color=color, label=behavior_title)
     plt.legend(facecolor="white", framealpha=1)
-    plt.title(f"Population Distribution, Predator rate: {PRED_RATE}")
+    plt.title(f"Population Distribution, Predator rate: {params['predator_rate']}")
     plt.ylabel("Proportion")
     plt.xlabel("Generation")
-    plt.savefig('full_simulation.png')
+    plt.savefig(os.path.join(out, 'full_simulation.png'))
     plt.clf()
 
-    
-    
-    # Do animation
-    fig = plt.figure()
+    # Do and save animation, one frame per kept generation
+    records = ({'generation': i, **{b: metrics[b][i] for b in behaviors}} for i in gens)
+    save_animation(
+        records, os.path.join(out, 'fullsim.gif'), behaviors, behavior_titles, colors,
+        every=every, predator_rate=params['predator_rate'],
+    )
+
+
+def plot_bands(summary: dict, behaviors: list[str], colors: list[str], labels: list[str],
+               expected: dict | None = None):
+    """
+    Draws the replicate mean of each behavior with its quantile band (light) and
+    confidence band of the mean (dark), from a replicates.summarize() result.
+    expected, a meanfield.expected_simulation() result, is drawn on top as dashed lines.
+    """
+    import matplotlib.pyplot as plt
+
+    for behavior, color, label in zip(behaviors, colors, labels):
+        stats = summary[behavior]
+        gens = range(len(stats['mean']))
+        plt.plot(gens, stats['mean'], color=color, label=label)
+        plt.fill_between(gens, stats['lower'], stats['upper'], color=color, alpha=0.15)
+        plt.fill_between(gens, stats['ci_lower'], stats['ci_upper'], color=color, alpha=0.4)
+        if expected is not None:
+            plt.plot(gens, expected[behavior], color=color, linestyle='--', linewidth=1)
+
+
+def full_sim_ensemble(replicates: int, params: dict | None = None, out: str = '.', seed=None):
+    import matplotlib.pyplot as plt
+    from meanfield import expected_simulation
+    from replicates import run_replicates, summarize
+
+    # Run replicates of the full simulation with all species involved, on seed's streams.
+    params = _plot_params('full', params)
+    gens, size, trees = params['gens'], params['size'], params['trees']
+    predator_rate, reprod_rate = params['predator_rate'], params['reprod_rate']
+    behaviors  = ['cowardice', 'altruist', 'gb_altruist', 'spite', 'selective_spite']
+    ensemble = run_replicates(replicates, gens, size, predator_rate, reprod_rate, behaviors, seed, trees)
+    summary = summarize(ensemble, behaviors)
+    expected = expected_simulation('full', gens, size, predator_rate, reprod_rate, trees)
+
+    # Plot results, with the mean-field expectation dashed
+    behavior_titles = ['Cowardice', 'Altruist', 'Green Beard Altruist', 'Spite', 'Selective Spite']
+    colors = ['red', 'yellow', 'green', 'purple', 'magenta']
+    plot_bands(summary, behaviors, colors, behavior_titles, expected)
     plt.ylim(0, 1)
-    plt.title('Population Distribution')
+    plt.legend(facecolor="white", framealpha=1)
+    plt.title(f"Population Distribution, {replicates} replicates, Predator rate: {predator_rate}")
+    plt.ylabel("Proportion")
+    plt.xlabel("Generation")
+    plt.savefig(os.path.join(out, 'full_simulation_ensemble.png'))
+    plt.clf()
 
-    # Init data for the bar graphs
-    y = [
-        metrics['cowardice'], 
-        metrics['altruist'], 
-        metrics['gb_altruist'],
-        metrics['spite'], 
-        metrics['selective_spite']
-    ]
-    bars = plt.bar(behavior_titles, [vals[0] for vals in y], color=colors)
 
-    # Generation counter display
-    gens = range(N_GENS)
-    gen = plt.text(0, 0.8, 'Generation: 0', size=20, bbox=dict(facecolor='grey', edgecolor='black', alpha=0.2))
+# Plotting function for each scenario
+PLOTS = {
+    'baseline': baseline,
+    'cowardice_altruist': altruist_cowardice,
+    'gb_cowardice': greenbeard_cowardice,
+    'spite_cowardice': spite_cowardice,
+    'selectivespite_cowardice': selectivespite_cowardice,
+    'full': full_sim,
+}
 
-    # Frame update procedure
-    def animate(i):
-        new_vals = [vals[i] for vals in y]
+# Plotting function for replicate runs of a scenario
+ENSEMBLE_PLOTS = {
+    'full': full_sim_ensemble,
+}
 
-        for bar, new_val in zip(bars, new_vals):
-            bar.set_height(new_val)
-        
-        gen.set_text(f'Generation: {gens[i]}, Predator Rate: {PRED_RATE}')
 
-    # Do and save animation
-    ani = animation.FuncAnimation(fig, animate, interval=400) 
-    ani.save('fullsim.gif', writer='imagemagick')
+def positive_int(text: str) -> int:
+    # argparse type for counts that must be at least 1, e.g. --animation-every
+    import argparse
 
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {text}")
+    return value
 
-if __name__ == "__main__":
 
-    # PARAMETERS
-    N_GENS = 50
-    POP_SIZE = 50
-    PRED_RATE = 0.7
-    REPROD_RATE = 0.7
-    TOP_PROP = [1] * len(range(N_GENS))
-
-    # baseline()                      # Baseline run of concept.
-    # altruist_cowardice()            # Test altruism vs cowardism
-    # greenbeard_cowardice()          # Test green beard altruism vs. cowardism
-    # spite_cowardice()               # Test spitefulness vs cowardism
-    # selectivespite_cowardice()      # Test selective spitefulness vs cowardism
-    full_sim()                      # Simulate environment with all types
+def _run(args, name: str, replicate: int, params: dict, seed: int, path: str):
+    # One run of the batch runner, written to the CSV file at path. Returns its absorption()
+    from stream import write_records
+
+    if args.checkpoint_dir:
+        from checkpoint import run_checkpointed
+
+        # Streams to path itself, keeping what an earlier attempt of the run already wrote
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+        return run_checkpointed(
+            name, **params, path=os.path.join(args.checkpoint_dir, f'{name}_r{replicate}.ckpt'),
+            out=path, rng=seed, every=args.checkpoint_every, interval=args.checkpoint_interval,
+        )
+
+    if os.path.exists(path):
+        os.remove(path)
+    if args.live:
+        from live import watch
+
+        records = watch(name, **params, rng=seed)
+        write_records(records, path)
+        return absorption(records, SCENARIOS[name].tracked)
+
+    state = {}
+    write_records(iter_simulation(name, **params, rng=seed, state=state), path)
+    return state['absorption']
+
+
+def cli(argv: list[str] | None = None):
+    """
+    Command line batch runner. Runs one or more registered scenarios in this one process,
+    writing every run to <out>/<scenario>_r<replicate>.csv and optionally drawing its figure.
+    Parameters not given on the command line come from each scenario's defaults.
+
+    e.g. python main.py full spite_cowardice --gens 100 --predator-rate 0.6 --replicates 5 --seed 1
+    """
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Run a-life simulation scenarios.")
+    parser.add_argument('scenarios', nargs='*', default=['full'], help=f"any of: {', '.join(SCENARIOS)}, or all")
+    parser.add_argument('--gens', type=int)
+    parser.add_argument('--size', type=int)
+    parser.add_argument('--predator-rate', type=float)
+    parser.add_argument('--reprod-rate', type=float)
+    parser.add_argument('--trees', type=int)
+    parser.add_argument('--seed', type=int, help="root seed, every run gets its own seed derived from it")
+    parser.add_argument('--replicates', type=int, default=1)
+    parser.add_argument('--out', default='results', help="directory for the CSV output")
+    parser.add_argument('--plot', action='store_true', help="also draw each scenario's figure")
+    parser.add_argument('--animation-every', type=positive_int, default=1, help="keep every n-th generation in animations")
+    parser.add_argument('--checkpoint-dir', help="checkpoint runs here, and resume any run that has a checkpoint")
+    parser.add_argument('--checkpoint-every', type=positive_int, default=100, help="generations between checkpoints")
+    parser.add_argument('--checkpoint-interval', type=float, help="also checkpoint after this many seconds")
+    parser.add_argument('--profile', action='store_true', help="print per phase timings of the generation loop")
+    parser.add_argument('--live', action='store_true', help="plot each run live while it runs")
+    args = parser.parse_args(argv)
+
+    if args.profile and args.live:
+        parser.error("--profile can't time a --live run, the simulation runs in another process")
+    if args.checkpoint_dir and args.live:
+        parser.error("--live runs can't be checkpointed, leave out --checkpoint-dir or --live")
+    names = list(SCENARIOS) if args.scenarios == ['all'] else args.scenarios
+    for name in names:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name}")
+
+    root = args.seed if args.seed is not None else root_seed()
+    os.makedirs(args.out, exist_ok=True)
+
+    for name in names:
+        overrides = {
+            'gens': args.gens, 'size': args.size, 'predator_rate': args.predator_rate,
+            'reprod_rate': args.reprod_rate, 'trees': args.trees,
+        }
+        params = {**SCENARIOS[name].defaults, **{k: v for k, v in overrides.items() if v is not None}}
+
+        for replicate in range(args.replicates):
+            seed = derive_seed(root, name, replicate)
+
+            path = os.path.join(args.out, f'{name}_r{replicate}.csv')
+            if args.profile:
+                # The whole run goes inside the profiler, however it is run
+                with profiling.profiling() as prof:
+                    absorbed = _run(args, name, replicate, params, seed, path)
+                print(prof.report())
+            else:
+                absorbed = _run(args, name, replicate, params, seed, path)
+
+            # Parameters and outcome next to the data, so figures can be redrawn from it later
+            meta = {'scenario': name, 'params': params, 'seed': seed, 'absorption': None}
+            if absorbed is not None:
+                meta['absorption'] = {'generation': absorbed[0], 'outcome': absorbed[1]}
+            with open(f'{os.path.splitext(path)[0]}.json', 'w') as f:
+                json.dump(meta, f)
+            status = '' if absorbed is None else f", {absorbed[1]} at generation {absorbed[0]}"
+            print(f"{name} replicate {replicate} (seed {seed}) -> {path}{status}")
+
+        if args.plot:
+            if args.replicates > 1 and name in ENSEMBLE_PLOTS:
+                ENSEMBLE_PLOTS[name](args.replicates, params, seed=derive_seed(root, name, 'ensemble'))
+            else:
+                # Drawn from the first replicate's saved data, skipped if nothing changed
+                from figures import regenerate
+
+                path = os.path.join(args.out, f'{name}_r0.csv')
+                if not regenerate(name, path, every=args.animation_every):
+                    print(f"{name} figure unchanged")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,84 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: meanfield.py
+
+Deterministic mean-field solver. In a large population an individual's partner at a tree is drawn
+from the current behavior mix, so the interaction table, predator_rate and reprod_rate give every
+behavior's expected number of children per generation. Iterating that expectation (replicator
+dynamics) gives the expected trajectory without any random draws. Every parameter can be an array,
+and a whole grid of parameter values is solved at once.
+
+Ignores finite population effects: the unpaired individual in an odd population, sampling without
+replacement and drift, so runs of small populations scatter (and can fix or die out) around it.
+"""
+
+import numpy as np
+
+from interactions import BEHAVIOR_IDS, SURVIVAL
+from main import SCENARIOS
+
+
+def survival_matrix(behaviors: list[str]) -> np.ndarray:
+    """
+    W[a, b]: chance an individual of behavior a gets food when a predator shows up at its tree
+    and its partner has behavior b. For a pair of the same behavior the two roles (e.g. the
+    altruist who alerts and the one who gets away) are equally likely, so their chances are averaged.
+    """
+    n = len(behaviors)
+    matrix = np.zeros((n, n))
+    for a, b1 in enumerate(behaviors):
+        for b, b2 in enumerate(behaviors):
+            odds = SURVIVAL[BEHAVIOR_IDS[b1]][BEHAVIOR_IDS[b2]]
+            if odds is None:
+                raise ValueError(f"No predator interaction defined for 1: {b1}, 2: {b2}")
+            matrix[a, b] = (odds[0] + odds[1]) / 2 if b1 == b2 else odds[0]
+    return matrix
+
+
+def expected_simulation(scenario: str, gens: int, size, predator_rate, reprod_rate, trees=None) -> dict:
+    """
+    Expected trajectory of a registered scenario, in the same form as the simulation records:
+    {behavior: share of the population entering each generation, 'population': expected size
+    of the generation each one produced}. Every value has shape (*grid, gens), where grid is the
+    broadcast shape of the parameters, so scalars give plain (gens,) arrays.
+
+    e.g. expected_simulation('full', 50, 1000, np.linspace(0, 1, 101), 0.7) solves 101 predator rates.
+
+    @size: starting population, split evenly between the scenario's behaviors
+    @trees: number of trees, unlimited if None (np.inf also works inside an array)
+    """
+    scenario = SCENARIOS[scenario]
+    behaviors = scenario.behaviors
+    matrix = survival_matrix(behaviors)
+
+    size = np.asarray(size, dtype=float)
+    predator_rate = np.asarray(predator_rate, dtype=float)
+    reprod_rate = np.asarray(reprod_rate, dtype=float)
+    trees = np.asarray(np.inf if trees is None else trees, dtype=float)
+    grid = np.broadcast_shapes(size.shape, predator_rate.shape, reprod_rate.shape, trees.shape)
+
+    # Even split, matching main.initial_population
+    k = np.arange(len(behaviors))
+    counts = np.maximum(np.ceil((size[..., None] - k) / len(behaviors)), 0)
+    counts = np.broadcast_to(counts, grid + (len(behaviors),))
+
+    shares = np.empty(grid + (gens, len(behaviors)))
+    population = np.empty(grid + (gens,))
+    for generation in range(gens):
+        total = counts.sum(axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mix = np.where(total[..., None] > 0, counts / total[..., None], 0.0)
+            # Share of the population that gets to a tree at all
+            foraging = np.where(total > 0, np.minimum(total, 2 * trees) / total, 0.0)
+
+        # Chance of food: no predator, or getting away from it given the partner mix
+        fed = (1 - predator_rate[..., None]) + predator_rate[..., None] * (mix @ matrix.T)
+        counts = counts * fed * (2 * reprod_rate * foraging)[..., None]
+
+        shares[..., generation, :] = mix
+        population[..., generation] = counts.sum(axis=-1)
+
+    return {
+        **{b: shares[..., behaviors.index(b)] for b in scenario.tracked},
+        'population': population,
+    }
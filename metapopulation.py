@@ -0,0 +1,139 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: metapopulation.py
+
+Patch structured (metapopulation) runs. The population is split into patches that each run the usual
+shuffle/pair/predator/reproduce generation on their own, so individuals only meet others from their
+patch. After reproducing, each child migrates to another patch with chance migration_rate, either
+any other patch (island) or a neighbour on a ring (ring). Patches are processed in parallel on a
+process pool, sent to the workers packed as one byte per individual.
+"""
+
+import os
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from checkpoint import unpack
+from interactions import BEHAVIOR_IDS
+from main import SCENARIOS, absorbed_records, do_generation
+from seeding import derive_seed, root_seed
+
+
+def initial_patches(patches: int, patch_size: int, behaviors: list[str]) -> list[bytes]:
+    # Every patch starts as an even split of the behaviors, packed like checkpoint.pack
+    codes = [BEHAVIOR_IDS[b] for b in behaviors]
+    return [bytes(codes[i % len(codes)] for i in range(patch_size)) for _ in range(patches)]
+
+
+def destinations(patch: int, patches: int, topology: str = 'island') -> list[int]:
+    """
+    Patches a migrant from patch can move to: every other patch (island) or the two
+    neighbours on a ring (ring).
+    """
+    if topology == 'island':
+        return [p for p in range(patches) if p != patch]
+    if topology == 'ring':
+        return sorted({(patch - 1) % patches, (patch + 1) % patches} - {patch})
+    raise ValueError(f"Unknown topology: {topology}")
+
+
+def _step_patch(task) -> tuple[bytes, dict]:
+    # One generation of one patch inside a worker. Returns the children that stay
+    # and the ones that migrate, by destination patch, both packed.
+    packed, predator_rate, reprod_rate, trees, migration_rate, targets, seed = task
+    rng = random.Random(seed)
+
+    next_gen, _, _ = do_generation(unpack(packed), predator_rate, reprod_rate, [], trees, rng=rng)
+
+    stay = bytearray()
+    moves = {}
+    for individual in next_gen:
+        code = BEHAVIOR_IDS[individual.behavior]
+        if targets and rng.random() < migration_rate:
+            moves.setdefault(rng.choice(targets), bytearray()).append(code)
+        else:
+            stay.append(code)
+
+    return bytes(stay), {p: bytes(codes) for p, codes in moves.items()}
+
+
+def iter_metapopulation(scenario: str, gens: int, patches: int, patch_size: int, predator_rate: float,
+                        reprod_rate: float, migration_rate: float = 0.01, trees: int | None = None,
+                        topology: str = 'island', seed: int | None = None, workers: int | None = None):
+    """
+    Generator of metapopulation records, one per generation, in the same form as
+    main.iter_simulation over the whole metapopulation, plus 'occupied': the number of
+    patches that still have anyone in them.
+
+    @patches: number of patches
+    @patch_size: starting size of each patch
+    @migration_rate: chance each child moves to another patch
+    @trees: number of trees in each patch, unlimited if None
+    @topology: 'island' (migrate anywhere) or 'ring' (migrate to a neighbour)
+    @seed: root seed, each patch and generation draws from its own derived stream,
+           so results are the same for any worker count
+    @workers: number of worker processes, defaults to the number of CPUs. 1 runs in this process
+    """
+    scenario = SCENARIOS[scenario]
+    if seed is None:
+        seed = root_seed()
+    targets = [destinations(p, patches, topology) for p in range(patches)]
+    codes = {b: BEHAVIOR_IDS[b] for b in scenario.tracked}
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, patches // (4 * workers))
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    try:
+        population = initial_patches(patches, patch_size, scenario.behaviors)
+        for generation in range(gens):
+            # Shares of the metapopulation entering the generation
+            size = sum(len(patch) for patch in population)
+            gen_metrics = {
+                b: sum(patch.count(code) for patch in population) / size if size else 0.0
+                for b, code in codes.items()
+            }
+
+            tasks = [
+                (patch, predator_rate, reprod_rate, trees, migration_rate, targets[p], derive_seed(seed, generation, p))
+                for p, patch in enumerate(population)
+            ]
+            results = pool.map(_step_patch, tasks, chunksize=chunksize) if pool else map(_step_patch, tasks)
+
+            # Migrants join their new patch after the ones who stayed, in order of the patch they left
+            stays, moves = zip(*results)
+            population = [
+                stays[p] + b''.join(m[p] for m in moves if p in m) for p in range(patches)
+            ]
+
+            size = sum(len(patch) for patch in population)
+            yield {
+                'generation': generation, **gen_metrics, 'population': size,
+                'occupied': sum(1 for patch in population if patch),
+            }
+
+            if size == 0:
+                # Extinct everywhere, nothing left to simulate
+                for record in absorbed_records(Counter(), scenario.tracked, generation + 1, gens,
+                                               predator_rate, reprod_rate, trees):
+                    yield {**record, 'occupied': 0}
+                return
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def do_simulation_metapopulation(gens: int, patches: int, patch_size: int, predator_rate: float, reprod_rate: float,
+                                 migration_rate: float = 0.01, trees: int | None = None, topology: str = 'island',
+                                 scenario: str = 'full', seed: int | None = None, workers: int | None = None) -> dict:
+    """
+    Runs a metapopulation and returns {metric: [value per generation]} for the scenario's
+    tracked behaviors, population and occupied patches.
+    """
+    metrics = {b: [] for b in [*SCENARIOS[scenario].tracked, 'population', 'occupied']}
+    for record in iter_metapopulation(scenario, gens, patches, patch_size, predator_rate, reprod_rate,
+                                      migration_rate, trees, topology, seed, workers):
+        for metric, values in metrics.items():
+            values.append(record[metric])
+    return metrics
@@ -0,0 +1,91 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: profiling.py
+
+Optional instrumentation for the generation loop. While a Profiler is active, main.do_generation
+records cumulative wall time and call counts per phase (shuffle, pairing, handle_predator,
+reproduction, metrics), predator encounters by behavior pair and the number of Individual objects
+allocated. When no profiler is active the loop only pays a few `is None` checks.
+
+    with profiling() as prof:
+        do_simulation_full(50, 5000, 0.7, 0.7)
+    print(prof.report())
+"""
+
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+# Profiler the generation loop reports to, None when profiling is off.
+active = None
+
+
+class Profiler:
+    '''
+    Accumulates per phase timings and counters over any number of generations.
+    on_generation, if given, is called with the profiler after every generation.
+    '''
+    def __init__(self, on_generation=None):
+        self.on_generation = on_generation
+        self.times = defaultdict(float)
+        self.calls = Counter()
+        self.encounters = Counter()
+        self.allocations = 0
+        self.generations = 0
+
+
+    def __repr__(self):
+        return f'Profiler over {self.generations} generations'
+
+
+    def lap(self, phase: str, start: float) -> float:
+        # Charge the time since start to phase, returns now as the next phase's start
+        now = time.perf_counter()
+        self.times[phase] += now - start
+        self.calls[phase] += 1
+        return now
+
+
+    def predator(self, behavior1: str, behavior2: str, seconds: float):
+        # One handle_predator call
+        self.times['handle_predator'] += seconds
+        self.calls['handle_predator'] += 1
+        self.encounters[(behavior1, behavior2)] += 1
+
+
+    def end_generation(self, allocated: int):
+        self.allocations += allocated
+        self.generations += 1
+        if self.on_generation is not None:
+            self.on_generation(self)
+
+
+    def report(self) -> str:
+        """
+        Table of time and calls per phase, then predator encounters by pair.
+        pairing includes the time spent in handle_predator.
+        """
+        lines = [f'{self.generations} generations, {self.allocations} individuals allocated']
+        total = sum(t for phase, t in self.times.items() if phase != 'handle_predator') or 1
+        for phase, seconds in self.times.items():
+            lines.append(
+                f'{phase:>16} {seconds:10.4f}s {100 * seconds / total:6.1f}% {self.calls[phase]:>10} calls'
+            )
+        for (b1, b2), n in self.encounters.most_common():
+            lines.append(f'{b1:>16} vs {b2:<16} {n:>10} predator encounters')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def profiling(on_generation=None):
+    """
+    Turns profiling on for the generation loop inside the with block, yields the Profiler.
+    """
+    global active
+    previous = active
+    active = Profiler(on_generation)
+    try:
+        yield active
+    finally:
+        active = previous
@@ -0,0 +1,110 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: render.py
+
+Animation rendering for the population distribution bar chart. Frames are drawn straight from a
+stream of metrics records (a list, or main.iter_simulation while it runs) and handed to an
+in-process writer: an ffmpeg pipe when ffmpeg is installed, otherwise Pillow for GIFs.
+"""
+
+import matplotlib.pyplot as plt
+from matplotlib import animation
+
+
+BEHAVIORS = ['cowardice', 'altruist', 'gb_altruist', 'spite', 'selective_spite']
+BEHAVIOR_TITLES = ['Cowardice', 'Altruist', 'Green Beard Altruist', 'Spite', 'Selective Spite']
+COLORS = ['red', 'yellow', 'green', 'purple', 'magenta']
+
+
+def pick_writer(path: str, fps: float):
+    """
+    In-process animation writer for path. ffmpeg streams frames through a pipe and handles
+    both GIF and video; without it Pillow can still write GIFs (holding the frames in memory).
+    """
+    if animation.writers.is_available('ffmpeg'):
+        return animation.FFMpegWriter(fps=fps)
+    if path.endswith('.gif'):
+        return animation.PillowWriter(fps=fps)
+    raise RuntimeError(f"ffmpeg is needed to write {path}, or use a .gif path")
+
+
+def bar_figure(labels: list[str], colors: list[str], title: str = 'Population Distribution'):
+    """
+    Empty population distribution bar chart. Returns the figure, its bars and the generation text.
+    """
+    fig = plt.figure()
+    plt.ylim(0, 1)
+    plt.title(title)
+
+    bars = plt.bar(labels, [0] * len(labels), color=colors)
+
+    # Generation counter display
+    gen = plt.text(0, 0.8, 'Generation: 0', size=20, bbox=dict(facecolor='grey', edgecolor='black', alpha=0.2))
+
+    return fig, bars, gen
+
+
+def _update(record: dict, behaviors: list[str], bars, gen, predator_rate):
+    # Set bar heights and counter text for one record, returns the changed artists
+    for bar, behavior in zip(bars, behaviors):
+        bar.set_height(record[behavior])
+
+    text = f"Generation: {record['generation']}"
+    if predator_rate is not None:
+        text += f', Predator Rate: {predator_rate}'
+    gen.set_text(text)
+
+    return [*bars, gen]
+
+
+def save_animation(records, path: str, behaviors: list[str] = BEHAVIORS, labels: list[str] = BEHAVIOR_TITLES,
+                   colors: list[str] = COLORS, every: int = 1, fps: float = 2.5, dpi: int = 100,
+                   predator_rate: float | None = None, writer=None) -> int:
+    """
+    Renders one bar chart frame per record and streams it to the writer, so frames can be
+    produced while the simulation is still running and never pile up in memory (except with
+    Pillow, which keeps frames until the end). Returns the number of frames written.
+
+    @records: iterable of metrics records with a 'generation' key, e.g. main.iter_simulation(...)
+    @path: output file, .gif or any video format ffmpeg knows
+    @every: keep only every n-th generation (frame decimation)
+    @fps: frames per second of the output
+    @writer: matplotlib writer, picked from the path if not given
+    """
+    if writer is None:
+        writer = pick_writer(path, fps)
+
+    fig, bars, gen = bar_figure(labels, colors)
+    frames = 0
+    with writer.saving(fig, path, dpi):
+        for i, record in enumerate(records):
+            if i % every:
+                continue
+            _update(record, behaviors, bars, gen, predator_rate)
+            writer.grab_frame()
+            frames += 1
+
+    plt.close(fig)
+    return frames
+
+
+def animate(metrics: dict, behaviors: list[str] = BEHAVIORS, labels: list[str] = BEHAVIOR_TITLES,
+            colors: list[str] = COLORS, every: int = 1, interval: int = 400, predator_rate: float | None = None):
+    """
+    Blitted FuncAnimation of a finished run for on-screen viewing. Has an explicit frame
+    count (one per kept generation) so it stops at the end of the run.
+
+    @metrics: {behavior: [proportion per generation]}, as returned by do_simulation_full
+    @every: keep only every n-th generation
+    @interval: delay between frames in ms
+    """
+    fig, bars, gen = bar_figure(labels, colors)
+    n_gens = len(metrics[behaviors[0]])
+
+    def frame(i):
+        record = {'generation': i, **{b: metrics[b][i] for b in behaviors}}
+        return _update(record, behaviors, bars, gen, predator_rate)
+
+    return animation.FuncAnimation(
+        fig, frame, frames=range(0, n_gens, every), interval=interval, blit=True, repeat=False,
+    )
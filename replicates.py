@@ -0,0 +1,74 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: replicates.py
+
+Replicate ensembles. Runs R independent trajectories at once on the count engine, with the
+replicates as a leading array axis so every generation is a single vectorized pass, and
+summarizes each behavior's proportion per generation with its mean, quantiles and CI band.
+"""
+
+import warnings
+from statistics import NormalDist
+
+import numpy as np
+
+from counts import do_simulation_counts, initial_counts
+from interactions import BEHAVIOR_IDS, FULL_BEHAVIORS
+
+
+def run_replicates(replicates: int, gens: int, size: int, predator_rate: float, reprod_rate: float,
+                   behaviors: list[str] = FULL_BEHAVIORS, rng=None, trees: int | None = None) -> np.ndarray:
+    """
+    Runs independent replicates of a scenario starting from an even split of behaviors.
+
+    Returns the proportion of each behavior in the population entering every generation,
+    shape (replicates, gens, behaviors), same convention as do_simulation_full. Generations
+    where a replicate has died out are NaN.
+
+    @replicates: number of independent trajectories
+    @behaviors: behaviors in the initial population, also the order of the last axis
+    @rng: seed or numpy Generator, a fresh one is made if not given
+    @trees: number of trees (carrying capacity), unlimited if None
+    """
+    start = np.tile(initial_counts(size, behaviors), (replicates, 1))
+    history = do_simulation_counts(gens, start, predator_rate, reprod_rate, rng, trees)[:, :-1]
+
+    tracked = history[..., [BEHAVIOR_IDS[b] for b in behaviors]]
+    alive = history.sum(axis=-1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(alive > 0, tracked / alive, np.nan)
+
+
+def summarize(ensemble: np.ndarray, behaviors: list[str] = FULL_BEHAVIORS,
+              quantiles: tuple[float, float] = (0.05, 0.95), confidence: float = 0.95) -> dict:
+    """
+    Per generation statistics of a (replicates, gens, behaviors) proportion array.
+
+    Returns {behavior: {'mean', 'median', 'lower', 'upper', 'ci_lower', 'ci_upper', 'alive'}},
+    each an array over generations. lower/upper are the given quantiles of the replicates,
+    ci_lower/ci_upper the normal confidence interval of the mean. Extinct replicates are left out.
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    with warnings.catch_warnings():
+        # All replicates extinct gives NaN stats, which is what we want
+        warnings.simplefilter('ignore', RuntimeWarning)
+        alive = np.sum(~np.isnan(ensemble), axis=0)
+        mean = np.nanmean(ensemble, axis=0)
+        median = np.nanmedian(ensemble, axis=0)
+        lower, upper = np.nanquantile(ensemble, quantiles, axis=0)
+        stderr = np.nanstd(ensemble, axis=0, ddof=1) / np.sqrt(alive)
+
+    summary = {}
+    for k, b in enumerate(behaviors):
+        summary[b] = {
+            'mean': mean[:, k],
+            'median': median[:, k],
+            'lower': lower[:, k],
+            'upper': upper[:, k],
+            'ci_lower': mean[:, k] - z * stderr[:, k],
+            'ci_upper': mean[:, k] + z * stderr[:, k],
+            'alive': alive[:, k],
+        }
+
+    return summary
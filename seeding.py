@@ -0,0 +1,62 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: seeding.py
+
+Random number streams. Every simulation takes an rng argument that can be a seed or a generator
+object; these helpers turn either into the generator an engine needs, and derive independent child
+seeds for each replicate, sweep point or worker from one root seed. A child seed only depends on
+the root seed and its key, so results are the same whatever the worker count or scheduling order.
+"""
+
+import hashlib
+import random
+
+
+def derive_seed(root: int, *key) -> int:
+    """
+    64 bit child seed for the stream named by key under root, e.g.
+    derive_seed(root, 'full', 3) for replicate 3 of the full scenario.
+    Distinct keys give statistically independent streams.
+    """
+    name = ':'.join(str(part) for part in (root, *key))
+    digest = hashlib.sha256(name.encode()).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+
+def spawn_seeds(root: int, n: int, *key) -> list[int]:
+    """
+    n independent child seeds under root (and optional key), one per replicate or task.
+    """
+    return [derive_seed(root, *key, i) for i in range(n)]
+
+
+def root_seed() -> int:
+    """
+    Fresh 64 bit root seed from the OS, for when the caller didn't give one.
+    Record it to reproduce the run.
+    """
+    return random.SystemRandom().getrandbits(64)
+
+
+def as_random(rng=None):
+    """
+    Generator for the object engine. None keeps the global random module (so random.seed
+    still works), an int seeds a new random.Random, a random.Random is used as is.
+    """
+    if rng is None:
+        return random
+    if isinstance(rng, int):
+        return random.Random(rng)
+    return rng
+
+
+def as_generator(rng=None):
+    """
+    numpy Generator for the array and count engines. None gives a freshly seeded one,
+    an int seeds a new one, a Generator is used as is.
+    """
+    import numpy as np
+
+    if rng is None or isinstance(rng, (int, np.integer)):
+        return np.random.default_rng(rng)
+    return rng
@@ -0,0 +1,151 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: store.py
+
+Binary trajectory store for replicate ensembles. One file holds a fixed dtype count array of shape
+(replicates, generations, behaviors) after a small JSON header with the scenario, parameters and
+seed. The array is opened memory-mapped, so analysis and plotting code can slice it without
+reading the whole file, and worker processes can each write their own replicates straight into it.
+
+    store = open_store('full.traj')
+    store.counts[:, -1]          # last generation of every replicate, read from disk on demand
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from counts import do_simulation_counts, initial_counts
+from interactions import BEHAVIOR_IDS
+from main import SCENARIOS
+from seeding import derive_seed, root_seed
+
+
+MAGIC = b'TRAJSTORE1\n'
+HEADER_SIZE = 4096
+
+
+class TrajectoryStore:
+    '''
+    An open trajectory file. counts is the (replicates, generations, behaviors) memmap,
+    meta the header dict (shape, dtype, behaviors, scenario, params, seed).
+    '''
+    def __init__(self, path: str, meta: dict, mode: str = 'r'):
+        self.path = path
+        self.meta = meta
+        self.behaviors = meta['behaviors']
+        self.counts = np.memmap(path, dtype=meta['dtype'], mode=mode, offset=HEADER_SIZE, shape=tuple(meta['shape']))
+
+
+    def __repr__(self):
+        return f"TrajectoryStore {self.path} with shape {tuple(self.meta['shape'])}"
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def flush(self):
+        if self.counts.mode != 'r':
+            self.counts.flush()
+
+
+    def close(self):
+        self.flush()
+        del self.counts
+
+
+    def proportions(self, replicates=slice(None)) -> np.ndarray:
+        """
+        Share of each behavior for the selected replicates, NaN where a replicate is extinct.
+        Same layout as replicates.run_replicates (the population entering each of the gens
+        generations), so it can go straight to replicates.summarize. The store's last row, the
+        population the final generation produced, is left out; read it from counts.
+        """
+        counts = np.asarray(self.counts[replicates, :-1], dtype=float)
+        alive = counts.sum(axis=-1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(alive > 0, counts / alive, np.nan)
+
+
+def create_store(path: str, replicates: int, generations: int, behaviors: list[str], dtype: str = 'int64',
+                 **meta) -> TrajectoryStore:
+    """
+    Creates an empty (all zero) store at path and opens it for writing. The file is sized up front,
+    so workers can open it with open_store(path, 'r+') and fill in their replicates in any order.
+
+    @meta: anything else to keep in the header, e.g. scenario, params, seed
+    """
+    meta = {
+        'shape': [replicates, generations, len(behaviors)], 'dtype': np.dtype(dtype).str,
+        'behaviors': behaviors, **meta,
+    }
+    header = MAGIC + json.dumps(meta).encode()
+    if len(header) > HEADER_SIZE:
+        raise ValueError(f"Store metadata is over {HEADER_SIZE} bytes")
+
+    size = HEADER_SIZE + replicates * generations * len(behaviors) * np.dtype(dtype).itemsize
+    with open(path, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b'\0'))
+        f.truncate(size)
+
+    return TrajectoryStore(path, meta, 'r+')
+
+
+def open_store(path: str, mode: str = 'r') -> TrajectoryStore:
+    """
+    Opens an existing store memory-mapped, read only by default. 'r+' to write into it.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    if not header.startswith(MAGIC):
+        raise ValueError(f"{path} is not a trajectory store")
+    meta = json.loads(header[len(MAGIC):].rstrip(b'\0'))
+    return TrajectoryStore(path, meta, mode)
+
+
+def _fill_block(task):
+    # Runs one block of replicates in a worker and writes it straight into the store
+    path, start, stop, params, seed = task
+    with open_store(path, 'r+') as store:
+        ids = [BEHAVIOR_IDS[b] for b in store.behaviors]
+        counts = np.tile(initial_counts(params['size'], store.behaviors), (stop - start, 1))
+        history = do_simulation_counts(
+            params['gens'], counts, params['predator_rate'], params['reprod_rate'], seed, params['trees']
+        )
+        store.counts[start:stop] = history[..., ids]
+
+
+def run_ensemble(path: str, scenario: str, replicates: int, gens: int, size: int, predator_rate: float,
+                 reprod_rate: float, trees: int | None = None, seed: int | None = None, block: int = 64,
+                 workers: int | None = None, dtype: str = 'int64') -> TrajectoryStore:
+    """
+    Runs replicates of a scenario on the count engine across a process pool, writing every
+    replicate's counts (initial population included, so gens + 1 generations) to a new store at path.
+    Returns the store opened read only.
+
+    @block: replicates per task, each block runs as one vectorized batch on its own derived seed,
+            so results don't depend on the worker count
+    """
+    if seed is None:
+        seed = root_seed()
+    behaviors = SCENARIOS[scenario].behaviors
+    params = {'gens': gens, 'size': size, 'predator_rate': predator_rate, 'reprod_rate': reprod_rate, 'trees': trees}
+
+    create_store(path, replicates, gens + 1, behaviors, dtype, scenario=scenario, params=params, seed=seed).close()
+
+    tasks = [
+        (path, start, min(start + block, replicates), params, derive_seed(seed, start // block))
+        for start in range(0, replicates, block)
+    ]
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_fill_block, tasks))
+
+    return open_store(path)
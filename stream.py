@@ -0,0 +1,99 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: stream.py
+
+On-disk output for streamed simulation records (see main.iter_simulation). Records are buffered
+and appended to a CSV file in chunks, so a long run uses constant memory, the file can be read
+while the run is still going, and a crashed run leaves everything up to the last chunk on disk.
+"""
+
+import csv
+import os
+
+
+class CSVSink:
+    '''
+    Appends metrics records (dicts with the same keys) to a CSV file, chunk_size records at a time.
+    The header is written once, when the file is new or empty. Use as a context manager so the
+    last partial chunk is written out at the end.
+    '''
+    def __init__(self, path: str, chunk_size: int = 100):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.fields = None
+
+
+    def __repr__(self):
+        return f'CSVSink writing to {self.path}'
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+    def write(self, record: dict):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.fields is None:
+            self.fields = list(self.buffer[0])
+
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.fields)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(self.buffer)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.buffer = []
+
+
+def write_records(records, path: str, chunk_size: int = 100) -> int:
+    """
+    Drains a record iterator (e.g. main.iter_simulation(...)) into a CSV file.
+    Returns the number of records written.
+
+    @records: iterable of metrics dicts
+    @path: CSV file to append to
+    @chunk_size: number of records held in memory between writes
+    """
+    count = 0
+    with CSVSink(path, chunk_size) as sink:
+        for record in records:
+            sink.write(record)
+            count += 1
+    return count
+
+
+def tee(records, sink: CSVSink):
+    """
+    Passes records through unchanged while also writing them to sink,
+    so a run can be plotted or inspected and saved at the same time.
+    """
+    for record in records:
+        sink.write(record)
+        yield record
+
+
+def read_records(path: str) -> list[dict]:
+    """
+    Reads back a CSV written by CSVSink, with generation and population as ints and
+    every other column (the behavior shares) as floats.
+    """
+    with open(path, newline='') as f:
+        return [
+            {k: int(v) if k in ('generation', 'population') else float(v) for k, v in row.items()}
+            for row in csv.DictReader(f)
+        ]
@@ -0,0 +1,227 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: sweep.py
+
+Parameter sweeps. Runs any do_simulation_* scenario over a grid or list of parameter sets on a
+process pool, giving every task its own seed, and collects the results in one tidy table.
+adaptive_sweep runs replicates in batches instead, until each point's estimate is tight enough.
+"""
+
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import main
+from seeding import derive_seed, root_seed
+
+
+# Names of the values returned by the simulations that return tuples or a bare list.
+METRIC_NAMES = {f'do_simulation_{name}': tuple(s.tracked) or ('population',) for name, s in main.SCENARIOS.items()}
+METRIC_NAMES['do_simulation_baseline_counts'] = ('population',)
+
+
+def grid(**axes) -> list[dict]:
+    """
+    Every combination of the given parameter values, e.g.
+    grid(predator_rate=[0.5, 0.7], size=[50, 500]) gives 4 points.
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def resolve(scenario):
+    """
+    Simulation function and default parameters for a registered scenario name
+    ('full' -> do_simulation_full), or for a simulation function itself.
+    """
+    if callable(scenario):
+        return scenario, main.DEFAULT_PARAMS
+    if scenario not in main.SCENARIOS:
+        raise ValueError(f"Unknown scenario: {scenario}")
+    return getattr(main, f'do_simulation_{scenario}'), main.SCENARIOS[scenario].defaults
+
+
+def as_metrics(simulation, result) -> dict:
+    """
+    Puts any do_simulation_* result in the {metric: [value per generation]} form.
+    """
+    if isinstance(result, dict):
+        return result
+    names = METRIC_NAMES[simulation.__name__]
+    if len(names) == 1:
+        result = (result,)
+    return dict(zip(names, result))
+
+
+def absorption(metrics: dict) -> tuple[int, str] | None:
+    """
+    main.absorption of a run in {metric: [value per generation]} form: (generation, outcome)
+    once it went extinct or one behavior took over, None if neither happened.
+    """
+    gens = len(next(iter(metrics.values()), []))
+    records = [{'generation': g, **{m: values[g] for m, values in metrics.items()}} for g in range(gens)]
+    return main.absorption(records, [m for m in metrics if m != 'population'])
+
+
+def _run_point(task) -> list[dict]:
+    # Runs one sweep point inside a worker, returns its tidy rows.
+    simulation, point, seed, cache = task
+    if cache is None:
+        result = simulation(**point, rng=seed)
+    else:
+        result = cache.call(simulation, **point, rng=seed)
+    metrics = as_metrics(simulation, result)
+    absorbed_at, outcome = absorption(metrics) or (None, None)
+
+    rows = []
+    for metric, values in metrics.items():
+        for generation, value in enumerate(values):
+            rows.append({
+                **point, 'seed': seed, 'generation': generation, 'metric': metric, 'value': value,
+                'absorbed_at': absorbed_at, 'outcome': outcome,
+            })
+    return rows
+
+
+def sweep(scenario, points: list[dict], seed: int | None = None, workers: int | None = None,
+          cache=None) -> list[dict]:
+    """
+    Runs a scenario at every parameter point across a process pool.
+
+    Returns a tidy table: one row per (point, generation, metric) holding the point's
+    parameters, its seed, the generation, the metric name and its value, in point order.
+    Every row also has the run's 'absorbed_at' generation and 'outcome' (see absorption),
+    both None if the run never went extinct or fixed.
+
+    @scenario: scenario name (e.g. 'full', 'spite_cowardice') or a do_simulation_* function
+    @points: parameter dicts (gens, size, predator_rate, reprod_rate, trees), missing keys use
+             the scenario's defaults
+    @seed: root seed, every point gets its own seed derived from it (seeding.derive_seed(seed, index)),
+           so results are the same for any worker count
+    @workers: number of worker processes, defaults to the number of CPUs
+    @cache: cache.ResultCache, points already run with the same seed are read from it
+    """
+    simulation, defaults = resolve(scenario)
+    if seed is None:
+        seed = root_seed()
+
+    tasks = [
+        (simulation, {**defaults, **point}, derive_seed(seed, i), cache)
+        for i, point in enumerate(points)
+    ]
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(tasks) // (4 * workers))
+
+    table = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for rows in pool.map(_run_point, tasks, chunksize=chunksize):
+            table.extend(rows)
+
+    return table
+
+
+# ADAPTIVE SWEEPS
+def final(metric: str):
+    # Statistic for adaptive_sweep: the metric's value in the last generation
+    return lambda metrics: metrics[metric][-1]
+
+
+def fixation(behavior: str):
+    # Statistic for adaptive_sweep: 1 if behavior took over the population by the end, else 0
+    return lambda metrics: float(metrics[behavior][-1] == 1.0)
+
+
+def _run_replicate(task) -> dict:
+    # Runs one replicate of a point inside a worker, returns its metrics
+    simulation, point, seed, cache = task
+    if cache is None:
+        return as_metrics(simulation, simulation(**point, rng=seed))
+    return as_metrics(simulation, cache.call(simulation, **point, rng=seed))
+
+
+def adaptive_sweep(scenario, points: list[dict], statistic, width: float = 0.05, batch: int = 8,
+                   max_replicates: int = 1000, budget: int | None = None, round_size: int = 32,
+                   confidence: float = 0.95, seed: int | None = None, workers: int | None = None,
+                   cache=None) -> list[dict]:
+    """
+    Estimates the mean of statistic at every point, running replicates in batches until the
+    point's confidence interval is narrower than width. Each round the remaining replicates go
+    to the points with the widest intervals first, so the work ends up at the uncertain points
+    (e.g. near a tipping point) instead of the ones that are already clear.
+
+    Returns one row per point: its parameters, 'replicates', 'mean', 'stderr', 'ci_lower',
+    'ci_upper' and 'converged' (False if it hit max_replicates or the budget first).
+
+    @statistic: function of one run's {metric: [value per generation]} giving a number,
+                e.g. final('spite') or fixation('cowardice')
+    @width: target width of the confidence interval (upper - lower)
+    @batch: replicates per point per round, also the minimum per point. A point whose first
+            batch all agree has a zero width interval, so use a larger batch for rare outcomes
+    @max_replicates: most replicates any one point gets
+    @budget: most replicates in total, unlimited if None
+    @round_size: replicates handed out per round (the first round always covers every point).
+                 Fixed rather than taken from the worker count, so which points get a limited
+                 budget doesn't depend on workers
+    @seed: root seed, replicate r of point i gets derive_seed(seed, i, r), so results only depend
+           on the seed, not on the worker count
+    @cache: cache.ResultCache, replicates already run with the same seed are read from it
+    """
+    simulation, defaults = resolve(scenario)
+    if seed is None:
+        seed = root_seed()
+    points = [{**defaults, **point} for point in points]
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    values = [[] for _ in points]
+
+    def interval(i):
+        # Half width of point i's confidence interval, inf until it has a batch
+        n = len(values[i])
+        if n < max(batch, 2):
+            return math.inf
+        mean = sum(values[i]) / n
+        var = sum((v - mean) ** 2 for v in values[i]) / (n - 1)
+        return z * math.sqrt(var / n)
+
+    workers = workers or os.cpu_count() or 1
+    spent = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            # Widest intervals first, one batch each, until the round is full
+            open_points = [i for i in range(len(points))
+                           if 2 * interval(i) > width and len(values[i]) < max_replicates]
+            open_points.sort(key=interval, reverse=True)
+
+            tasks, owners = [], []
+            for i in open_points:
+                if len(tasks) >= round_size and all(len(v) for v in values):
+                    break
+                n = len(values[i])
+                count = min(batch, max_replicates - n)
+                if budget is not None:
+                    count = min(count, budget - spent - len(tasks))
+                for r in range(n, n + count):
+                    tasks.append((simulation, points[i], derive_seed(seed, i, r), cache))
+                    owners.append(i)
+            if not tasks:
+                break
+
+            chunksize = max(1, len(tasks) // (4 * workers))
+            for i, metrics in zip(owners, pool.map(_run_replicate, tasks, chunksize=chunksize)):
+                values[i].append(statistic(metrics))
+            spent += len(tasks)
+
+    table = []
+    for i, point in enumerate(points):
+        n = len(values[i])
+        mean = sum(values[i]) / n if n else math.nan
+        half = interval(i)
+        table.append({
+            **point, 'replicates': n, 'mean': mean, 'stderr': half / z,
+            'ci_lower': mean - half, 'ci_upper': mean + half, 'converged': 2 * half <= width,
+        })
+
+    return table
@@ -0,0 +1,19 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: tables.py
+
+The interaction table (see interactions.py) as numpy arrays, built once for the array engines
+(vectorized.py, counts.py, crn.py) to index by behavior ID.
+"""
+
+import numpy as np
+
+from interactions import EXCLUSIVE as EXCLUSIVE_TABLE, SURVIVAL
+
+
+# SURVIVE[id1, id2, k] is the chance individual k of the pair gets food, NaN for pairs that can never meet.
+SURVIVE = np.array(
+    [[odds if odds is not None else (np.nan, np.nan) for odds in row] for row in SURVIVAL]
+)
+UNDEFINED = np.isnan(SURVIVE[..., 0])
+EXCLUSIVE = np.array(EXCLUSIVE_TABLE, dtype=bool)
@@ -0,0 +1,129 @@
+"""
+Author: Jay Turnsek, Liam Johnston
+Title: vectorized.py
+
+Array based generation engine. The population is stored as a compact array of integer
+behavior codes instead of a list of Individual objects. Pairing is drawn in count form (see
+counts.pair_counts) rather than by shuffling every individual, and every other step of a
+generation (predator draw, survival draws, reproduction) is one batched numpy operation.
+
+Measured with bench.bench_case on the full scenario, one generation runs about 130-145x faster
+than the object engine at 10^6 individuals and 105-120x at 10^5. Fixed per generation overhead
+(about 0.25 ms) caps it at 40-60x at 10^4 and under 10x at 10^3; use the count engine there.
+"""
+
+import numpy as np
+
+from interactions import BEHAVIORS, BEHAVIOR_IDS, FULL_BEHAVIORS
+from main import Individual
+from counts import pair_counts
+from seeding import as_generator
+from tables import EXCLUSIVE, SURVIVE, UNDEFINED
+
+
+# BEHAVIOR ENCODING
+CODES = BEHAVIOR_IDS
+
+# Behavior codes in the first and second slot of each pair kind, in pair_counts' flattened order.
+_FIRST, _SECOND = (a.ravel().astype(np.int8) for a in np.indices((len(BEHAVIORS), len(BEHAVIORS))))
+
+
+# CONVERSION
+def encode(population: list[Individual]) -> np.ndarray:
+    """
+    Packs a list of individuals into an int8 array of behavior codes.
+    """
+    return np.fromiter((CODES[i.behavior] for i in population), dtype=np.int8, count=len(population))
+
+
+def decode(codes: np.ndarray) -> list[Individual]:
+    """
+    Unpacks an array of behavior codes back into Individual objects.
+    """
+    return [Individual(BEHAVIORS[c]) for c in codes]
+
+
+# GENERATION FUNCTIONS
+def do_generation_full_vectorized(codes: np.ndarray, predator_rate: float, reprod_rate: float, rng=None,
+                                  trees: int | None = None):
+    """
+    Array version of do_generation_full. Same rules, same gen_metrics dict, but the
+    population is an array of behavior codes and all random draws are done in bulk.
+
+    @codes: int8 array of behavior codes (see encode)
+    @predator_rate: chance a predator is present at a tree
+    @reprod_rate: chance a fed individual reproduces
+    @rng: seed or numpy Generator, a fresh one is made if not given
+    @trees: number of trees, only two individuals per tree forage. Unlimited if None
+    """
+    rng = as_generator(rng)
+    counts = np.bincount(codes, minlength=len(BEHAVIORS))
+
+    # Individuals of a behavior are interchangeable, so the shuffle only matters for the makeup of
+    # the pairs: draw how many trees get every (behavior 1, behavior 2) pair instead of shuffling
+    # the whole population, then lay the trees out pair kind by pair kind.
+    # An odd individual out never reaches a tree, so never eats.
+    pairs = pair_counts(counts, rng, trees).ravel()
+    n_pairs = int(pairs.sum())
+    ind1 = np.repeat(_FIRST, pairs)
+    ind2 = np.repeat(_SECOND, pairs)
+
+    # Every uniform in one draw: predator, survival of either slot, reproduction of either slot
+    u = rng.random(5 * n_pairs).reshape(5, n_pairs)
+
+    # Determine which trees have a predator
+    predator = u[0] <= predator_rate
+
+    # Survival odds for every pair at once, laid out by pair kind like the trees
+    if (UNDEFINED.ravel() & (pairs > 0)).any():
+        bad = np.repeat(UNDEFINED.ravel(), pairs) & predator
+        if bad.any():
+            b1, b2 = BEHAVIORS[ind1[bad][0]], BEHAVIORS[ind2[bad][0]]
+            raise ValueError(f"No predator interaction defined for 1: {b1}, 2: {b2}")
+    odds1 = np.repeat(SURVIVE[..., 0].ravel(), pairs)
+    odds2 = np.repeat(SURVIVE[..., 1].ravel(), pairs)
+    exclusive = np.repeat(EXCLUSIVE.ravel(), pairs)
+
+    fed1 = u[1] < odds1
+    fed2 = np.where(exclusive, ~fed1, u[2] < odds2)
+
+    # No predator, both get food and live
+    fed1 |= ~predator
+    fed2 |= ~predator
+
+    # Reproduction, osmosis style. Only if food was grabbed. The order of the next generation
+    # doesn't matter, its pairs are drawn afresh
+    parents = np.concatenate([ind1[fed1 & (u[3] < reprod_rate)], ind2[fed2 & (u[4] < reprod_rate)]])
+    next_gen = np.repeat(parents, 2)
+
+    # Metrics for plot
+    size = max(len(codes), 1)
+    gen_metrics = {b: float(counts[CODES[b]] / size) for b in FULL_BEHAVIORS}
+
+    return next_gen, gen_metrics
+
+
+# SIMULATION FUNCTIONS
+def do_simulation_full_vectorized(gens: int, size: int, predator_rate: float, reprod_rate: float, rng=None,
+                                  trees: int | None = None):
+    """
+    Array version of do_simulation_full, returns the same metrics dict of lists.
+    """
+    rng = as_generator(rng)
+
+    # Init population, with even split of all behavior types.
+    full_codes = np.array([CODES[b] for b in FULL_BEHAVIORS], dtype=np.int8)
+    population = full_codes[np.arange(size) % len(full_codes)]
+    metrics = {b: [] for b in FULL_BEHAVIORS}
+
+    for _ in range(gens):
+        # Do generation, save proportions for plotting later
+        population, cur_metrics = do_generation_full_vectorized(
+            population, predator_rate, reprod_rate, rng, trees
+        )
+
+        # Add to metrics dict
+        for b in FULL_BEHAVIORS:
+            metrics[b].append(cur_metrics[b])
+
+    return metrics